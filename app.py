@@ -1,32 +1,83 @@
 import os
+import asyncio
 from fastapi import (
     FastAPI,
     HTTPException,
     status,
-    Depends
+    Depends,
+    Request,
+    Response,
+    Query
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from datetime import datetime
-from utils.database import connect_to_db
+from typing import Any, Dict, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from utils.database import connect_to_db, close_db
+from utils.indexes import ensure_indexes
+from utils.coalesce import progress_buffer
+from utils.export import export_lines, gzip_chunks, parse_collections, parse_resume_from
+from utils.restore import RESTORE_BATCH_SIZE, iter_lines, restore_lines
+from utils.cache import MISS, document_cache, notes_key, profile_key, progress_key
+from utils.compression import CompressionMiddleware
+from utils.limits import BodySizeLimitMiddleware
+from utils.metrics import MetricsMiddleware, render_metrics
+from utils.slow_queries import slow_query_profiler
+from utils.ratelimit import auth_limiter
+from utils.content import load_catalogs, load_manifest
+from utils.http import VERSION_FIELDS, document_etag, etag_matches
+from utils.serialization import NegotiatedResponse, NegotiatedRoute
 from utils.models import (
     UserRegister,
     UserLogin,
     NotesBackup,
+    NotesBatch,
     ProgressData,
+    ProgressPatch,
+    SyncRequest,
     PasswordChange,
     DeleteAccount
 )
 from utils.util import (
-    get_password_hash,
     create_access_token,
-    verify_password,
-    get_current_user
+    get_current_user,
+    require_admin
 )
+from utils.hashing import (
+    hashing_pool,
+    hash_password,
+    check_password
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global database
+    # The worker only starts serving once the pool is connected and warm
+    database = await connect_to_db()
+    hashing_pool.start()
+    await ensure_indexes(database)
+    yield
+    await progress_buffer.flush()
+    hashing_pool.shutdown()
+    await close_db(database)
+
 
 # initialize app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=NegotiatedResponse)
+app.router.route_class = NegotiatedRoute
+
+# Inside CompressionMiddleware, so limits apply to inflated gzip bodies
+app.add_middleware(BodySizeLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Latency covers encoding and compression too
+app.add_middleware(MetricsMiddleware)
 
 """SET UP CORS"""
+# Added last so it is outermost and 413/415 replies from the middleware above carry CORS headers
 origins = ["*"]
 app.add_middleware(
     CORSMiddleware,
@@ -36,17 +87,55 @@ app.add_middleware(
     allow_methods=["*"],
 )
 
-database = connect_to_db()
+# Collections, populated by the lifespan hook once the client is connected
+database: Dict[str, Any] = {}
+catalogs = load_catalogs()
+content_manifest = load_manifest(catalogs)
 
 # root
 @app.get("/")
-def root():
+async def root():
     return {
         "message": "Hello Godslighthouse Starter Kit Server",
         "version": "1.0.0",
         "date": "28-1-26"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+async def read_backup(collection, cache_key: str, user_identifier: str, if_none_match: Optional[str]):
+    """
+    Load a user's progress or notes document for a download, returning
+    (document, not_modified). Served from the document cache when possible;
+    on a miss a matching If-None-Match is checked with a projected read of
+    the version fields before the whole document is read.
+    """
+    generation = document_cache.generation(cache_key)
+    document = await document_cache.get(cache_key)
+    if document is MISS:
+        if if_none_match:
+            stamp = await collection.find_one({"user_identifier": user_identifier}, VERSION_FIELDS)
+            if not stamp:
+                return None, False
+            etag = document_etag(stamp)
+            if etag and etag_matches(if_none_match, etag):
+                return stamp, True
+        document = await collection.find_one(
+            {"user_identifier": user_identifier},
+            {"_id": 0}  # Exclude MongoDB ID
+        )
+        await document_cache.set(cache_key, document, generation)
+    elif document and if_none_match:
+        etag = document_etag(document)
+        if etag and etag_matches(if_none_match, etag):
+            return document, True
+    return document, False
+
 
 """
 User Auth APIS
@@ -54,20 +143,14 @@ User Auth APIS
 
 
 @app.post("/api/auth/register", status_code=status.HTTP_201_CREATED)
-def register_user(user: UserRegister):
+async def register_user(user: UserRegister, request: Request):
     """Register a new user with phone/email and password"""
     users_collection = database["users_collection"]
     
-    # Check if user already exists
-    existing_user = users_collection.find_one({"phone_or_email": user.phone_or_email})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User with this phone/email already exists"
-        )
+    await auth_limiter.check(request, user.phone_or_email)
     
     # Hash password and save user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     user_data = {
         "phone_or_email": user.phone_or_email,
         "hashed_password": hashed_password,
@@ -75,7 +158,9 @@ def register_user(user: UserRegister):
     }
     
     try:
-        result = users_collection.insert_one(user_data)
+        # The unique phone_or_email index rejects duplicates in the same round trip
+        result = await users_collection.insert_one(user_data)
+        await document_cache.invalidate(profile_key(user.phone_or_email))
         # Create access token
         access_token = create_access_token(data={"sub": user.phone_or_email})
         
@@ -85,6 +170,11 @@ def register_user(user: UserRegister):
             "access_token": access_token,
             "token_type": "bearer"
         }
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this phone/email already exists"
+        )
     except Exception as e:
         print(e)
         raise HTTPException(
@@ -93,12 +183,14 @@ def register_user(user: UserRegister):
         )
 
 @app.post("/api/auth/login")
-def login_user(user: UserLogin):
+async def login_user(user: UserLogin, request: Request):
     """Login user and return access token"""
     users_collection = database["users_collection"]
     
+    await auth_limiter.check(request, user.phone_or_email)
+    
     # Find user
-    db_user = users_collection.find_one({"phone_or_email": user.phone_or_email})
+    db_user = await users_collection.find_one({"phone_or_email": user.phone_or_email})
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -106,7 +198,7 @@ def login_user(user: UserLogin):
         )
     
     # Verify password
-    if not verify_password(user.password, db_user["hashed_password"]):
+    if not await check_password(user.password, db_user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect phone/email or password"
@@ -126,26 +218,38 @@ def login_user(user: UserLogin):
 User Progress APIS
 """
 
+def progress_update(progress_data: ProgressData) -> Dict[str, Any]:
+    """Update document replacing a user's whole progress"""
+    return {
+        "$set": {
+            "progress": progress_data.progress,
+            "current_level": progress_data.current_level,
+            "current_week": progress_data.current_week,
+            "current_audio": progress_data.current_audio,
+            "updated_at": progress_data.updated_at
+        },
+        "$inc": {"version": 1}
+    }
+
 @app.post("/api/progress/upload", status_code=status.HTTP_200_OK)
-def upload_progress(progress_data: ProgressData):
+async def upload_progress(progress_data: ProgressData):
     """Upload user's local progress to cloud"""
     progress_collection = database["progress_collection"]
     
+    update = progress_update(progress_data)
+    
     try:
-        # Upsert (update if exists, insert if not)
-        progress_collection.update_one(
-            {"user_identifier": progress_data.user_identifier},
-            {
-                "$set": {
-                    "progress": progress_data.progress,
-                    "current_level": progress_data.current_level,
-                    "current_week": progress_data.current_week,
-                    "current_audio": progress_data.current_audio,
-                    "updated_at": progress_data.updated_at
-                }
-            },
-            upsert=True
-        )
+        if progress_buffer.enabled:
+            # Coalesce with other uploads from this user, written in bulk
+            await progress_buffer.submit(progress_collection, progress_data.user_identifier, update)
+        else:
+            # Upsert (update if exists, insert if not)
+            await progress_collection.update_one(
+                {"user_identifier": progress_data.user_identifier},
+                update,
+                upsert=True
+            )
+        await document_cache.invalidate(progress_key(progress_data.user_identifier))
         
         return {
             "status": True,
@@ -158,15 +262,85 @@ def upload_progress(progress_data: ProgressData):
             detail="Failed to upload progress"
         )
 
+@app.post("/api/progress/patch", status_code=status.HTTP_200_OK)
+async def patch_progress(patch: ProgressPatch):
+    """Apply path-level progress changes instead of replacing the whole tree"""
+    progress_collection = database["progress_collection"]
+    
+    set_fields = {}
+    unset_fields = {}
+    for operation in patch.operations:
+        path = "progress." + ".".join(operation.path)
+        if operation.op == "set":
+            set_fields[path] = operation.value
+        else:
+            unset_fields[path] = ""
+    for field in ("current_level", "current_week", "current_audio"):
+        value = getattr(patch, field)
+        if value is not None:
+            set_fields[field] = value
+    set_fields["updated_at"] = patch.updated_at
+    
+    update = {"$set": set_fields, "$inc": {"version": 1}}
+    if unset_fields:
+        update["$unset"] = unset_fields
+    
+    if progress_buffer.enabled:
+        await progress_buffer.flush(patch.user_identifier)
+    
+    query = {"user_identifier": patch.user_identifier}
+    if patch.base_version is not None:
+        query["version"] = patch.base_version
+    
+    try:
+        result = await progress_collection.find_one_and_update(
+            query,
+            update,
+            projection={"_id": 0, "version": 1},
+            upsert=patch.base_version is None,
+            return_document=ReturnDocument.AFTER
+        )
+        await document_cache.invalidate(progress_key(patch.user_identifier))
+    except OperationFailure as e:
+        print(e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Progress patch does not match the stored progress"
+        )
+    except Exception as e:
+        print(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to patch progress"
+        )
+    
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Progress has changed on the server, download it before patching"
+        )
+    
+    return {
+        "status": True,
+        "message": "Progress patched successfully",
+        "version": result["version"]
+    }
+
 @app.get("/api/progress/download/{user_identifier}")
-def download_progress(user_identifier: str):
+async def download_progress(user_identifier: str, request: Request):
     """Download user's progress from cloud"""
     progress_collection = database["progress_collection"]
     
     try:
-        progress_data = progress_collection.find_one(
-            {"user_identifier": user_identifier},
-            {"_id": 0}  # Exclude MongoDB ID
+        if progress_buffer.enabled:
+            # Also waits for a flush already writing this user's upload
+            await progress_buffer.flush(user_identifier)
+        
+        progress_data, not_modified = await read_backup(
+            progress_collection,
+            progress_key(user_identifier),
+            user_identifier,
+            request.headers.get("if-none-match")
         )
         
         if not progress_data:
@@ -175,10 +349,14 @@ def download_progress(user_identifier: str):
                 detail="No progress found for this user"
             )
         
-        return {
-            "status": True,
-            "data": progress_data
-        }
+        etag = document_etag(progress_data)
+        if not_modified:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        # Encoded straight from the stored document, skipping jsonable_encoder
+        return NegotiatedResponse(
+            {"status": True, "data": progress_data},
+            headers={"ETag": etag} if etag else None
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -193,23 +371,48 @@ def download_progress(user_identifier: str):
 Notes Backup APIS
 """
 
+def notes_update(notes_data: NotesBackup) -> Dict[str, Any]:
+    """Update document replacing all of a user's notes"""
+    return {
+        "$set": {
+            "notes": notes_data.notes,
+            "notes_count": len(notes_data.notes),
+            "updated_at": notes_data.updated_at
+        },
+        "$inc": {"version": 1}
+    }
+
+
+# Final update-pipeline stage for partial notes writes: recount the notes
+# server-side (also fixes documents written before notes_count existed)
+NOTES_SUMMARY_STAGE = {
+    "$set": {
+        "notes_count": {"$size": {"$objectToArray": {"$ifNull": ["$notes", {}]}}},
+        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+    }
+}
+
+# Projection reading just the count, computed by the server for old documents
+NOTES_COUNT_PROJECTION = {
+    "_id": 0,
+    "notes_count": {
+        "$ifNull": ["$notes_count", {"$size": {"$objectToArray": {"$ifNull": ["$notes", {}]}}}]
+    }
+}
+
 @app.post("/api/notes/backup", status_code=status.HTTP_200_OK)
-def backup_notes(notes_data: NotesBackup):
+async def backup_notes(notes_data: NotesBackup):
     """Backup all user notes to cloud"""
     notes_collection = database["notes_collection"]
     
     try:
         # Upsert notes
-        notes_collection.update_one(
+        await notes_collection.update_one(
             {"user_identifier": notes_data.user_identifier},
-            {
-                "$set": {
-                    "notes": notes_data.notes,
-                    "updated_at": notes_data.updated_at
-                }
-            },
+            notes_update(notes_data),
             upsert=True
         )
+        await document_cache.invalidate(notes_key(notes_data.user_identifier))
         
         return {
             "status": True,
@@ -222,15 +425,58 @@ def backup_notes(notes_data: NotesBackup):
             detail="Failed to backup notes"
         )
 
+@app.post("/api/notes/batch", status_code=status.HTTP_200_OK)
+async def batch_notes(batch: NotesBatch):
+    """Upsert and delete individual notes in a single update"""
+    notes_collection = database["notes_collection"]
+    
+    # One pipeline update: merge upserts, drop deletes, refresh notes_count
+    upserts = {note.audio_id: note.note_text for note in batch.upserts}
+    pipeline = [{
+        "$set": {
+            "notes": {"$mergeObjects": [{"$ifNull": ["$notes", {}]}, {"$literal": upserts}]},
+            "updated_at": {"$literal": batch.updated_at}
+        }
+    }]
+    if batch.deletes:
+        pipeline.append({"$unset": [f"notes.{audio_id}" for audio_id in batch.deletes]})
+    pipeline.append(NOTES_SUMMARY_STAGE)
+    
+    try:
+        result = await notes_collection.find_one_and_update(
+            {"user_identifier": batch.user_identifier},
+            pipeline,
+            projection={"_id": 0, "version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        await document_cache.invalidate(notes_key(batch.user_identifier))
+    except Exception as e:
+        print(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update notes"
+        )
+    
+    return {
+        "status": True,
+        "message": "Notes updated successfully",
+        "upserted": len(batch.upserts),
+        "deleted": len(batch.deletes),
+        "version": result["version"]
+    }
+
 @app.get("/api/notes/retrieve/{user_identifier}")
-def retrieve_notes(user_identifier: str):
+async def retrieve_notes(user_identifier: str, request: Request):
     """Retrieve user's notes from cloud"""
     notes_collection = database["notes_collection"]
     
     try:
-        notes_data = notes_collection.find_one(
-            {"user_identifier": user_identifier},
-            {"_id": 0}  # Exclude MongoDB ID
+        notes_data, not_modified = await read_backup(
+            notes_collection,
+            notes_key(user_identifier),
+            user_identifier,
+            request.headers.get("if-none-match")
         )
         
         if not notes_data:
@@ -242,10 +488,14 @@ def retrieve_notes(user_identifier: str):
                 }
             }
         
-        return {
-            "status": True,
-            "data": notes_data
-        }
+        etag = document_etag(notes_data)
+        if not_modified:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        # Encoded straight from the stored document, skipping jsonable_encoder
+        return NegotiatedResponse(
+            {"status": True, "data": notes_data},
+            headers={"ETag": etag} if etag else None
+        )
     except Exception as e:
         print(e)
         raise HTTPException(
@@ -254,8 +504,81 @@ def retrieve_notes(user_identifier: str):
         )
 
 
+"""
+Sync APIS
+"""
+
+async def sync_document(collection, user_identifier: str, update: Optional[Dict[str, Any]], known_version: Optional[int]):
+    """
+    Write `update` if given and return the new version, otherwise return the
+    stored document only when its version differs from `known_version`.
+    """
+    if update is not None:
+        result = await collection.find_one_and_update(
+            {"user_identifier": user_identifier},
+            update,
+            projection={"_id": 0, "version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return {"version": result["version"], "changed": False}
+    
+    query = {"user_identifier": user_identifier}
+    if known_version is not None:
+        query["version"] = {"$ne": known_version}
+    document = await collection.find_one(query, {"_id": 0})
+    if not document:
+        return {"version": known_version, "changed": False}
+    return {"version": document.get("version"), "changed": True, "data": document}
+
+
+@app.post("/api/sync", status_code=status.HTTP_200_OK)
+async def sync(sync_data: SyncRequest):
+    """Upload and/or download progress and notes in one round trip"""
+    progress_collection = database["progress_collection"]
+    notes_collection = database["notes_collection"]
+    user_identifier = sync_data.user_identifier
+    
+    try:
+        if progress_buffer.enabled:
+            await progress_buffer.flush(user_identifier)
+        
+        progress, notes = await asyncio.gather(
+            sync_document(
+                progress_collection,
+                user_identifier,
+                progress_update(sync_data.progress) if sync_data.progress else None,
+                sync_data.progress_version
+            ),
+            sync_document(
+                notes_collection,
+                user_identifier,
+                notes_update(sync_data.notes) if sync_data.notes else None,
+                sync_data.notes_version
+            )
+        )
+        uploaded = []
+        if sync_data.progress:
+            uploaded.append(progress_key(user_identifier))
+        if sync_data.notes:
+            uploaded.append(notes_key(user_identifier))
+        await document_cache.invalidate(*uploaded)
+    except Exception as e:
+        print(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to sync"
+        )
+    
+    return {
+        "status": True,
+        "progress": progress,
+        "notes": notes
+    }
+
+
 @app.get("/api/auth/verify")
-def verify_token(current_user: str = Depends(get_current_user)):
+async def verify_token(current_user: str = Depends(get_current_user)):
     """Verify if a token is valid"""
     return {
         "status": True,
@@ -265,7 +588,7 @@ def verify_token(current_user: str = Depends(get_current_user)):
 
 
 @app.post("/api/auth/refresh")
-def refresh_token(current_user: str = Depends(get_current_user)):
+async def refresh_token(current_user: str = Depends(get_current_user)):
     """Refresh access token"""
     new_token = create_access_token(data={"sub": current_user})
     return {
@@ -276,12 +599,14 @@ def refresh_token(current_user: str = Depends(get_current_user)):
 
 
 @app.post("/api/auth/change-password")
-def change_password(password_data: PasswordChange):
+async def change_password(password_data: PasswordChange, request: Request):
     """Change user password"""
     users_collection = database["users_collection"]
     
+    await auth_limiter.check(request, password_data.user_identifier)
+    
     # Find user
-    user = users_collection.find_one({"phone_or_email": password_data.user_identifier})
+    user = await users_collection.find_one({"phone_or_email": password_data.user_identifier})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -289,18 +614,19 @@ def change_password(password_data: PasswordChange):
         )
     
     # Verify old password
-    if not verify_password(password_data.old_password, user["hashed_password"]):
+    if not await check_password(password_data.old_password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect old password"
         )
     
     # Update password
-    new_hashed_password = get_password_hash(password_data.new_password)
-    users_collection.update_one(
+    new_hashed_password = await hash_password(password_data.new_password)
+    await users_collection.update_one(
         {"phone_or_email": password_data.user_identifier},
         {"$set": {"hashed_password": new_hashed_password}}
     )
+    await document_cache.invalidate(profile_key(password_data.user_identifier))
     
     return {
         "status": True,
@@ -309,14 +635,16 @@ def change_password(password_data: PasswordChange):
 
 
 @app.delete("/api/auth/delete-account")
-def delete_account(delete_data: DeleteAccount):
+async def delete_account(delete_data: DeleteAccount, request: Request):
     """Delete user account and all associated data"""
     users_collection = database["users_collection"]
     progress_collection = database["progress_collection"]
     notes_collection = database["notes_collection"]
     
+    await auth_limiter.check(request, delete_data.user_identifier)
+    
     # Find and verify user
-    user = users_collection.find_one({"phone_or_email": delete_data.user_identifier})
+    user = await users_collection.find_one({"phone_or_email": delete_data.user_identifier})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -324,16 +652,24 @@ def delete_account(delete_data: DeleteAccount):
         )
     
     # Verify password
-    if not verify_password(delete_data.password, user["hashed_password"]):
+    if not await check_password(delete_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password"
         )
     
     # Delete all user data
-    users_collection.delete_one({"phone_or_email": delete_data.user_identifier})
-    progress_collection.delete_one({"user_identifier": delete_data.user_identifier})
-    notes_collection.delete_one({"user_identifier": delete_data.user_identifier})
+    await progress_buffer.discard(delete_data.user_identifier)
+    await asyncio.gather(
+        users_collection.delete_one({"phone_or_email": delete_data.user_identifier}),
+        progress_collection.delete_one({"user_identifier": delete_data.user_identifier}),
+        notes_collection.delete_one({"user_identifier": delete_data.user_identifier})
+    )
+    await document_cache.invalidate(
+        profile_key(delete_data.user_identifier),
+        progress_key(delete_data.user_identifier),
+        notes_key(delete_data.user_identifier)
+    )
     
     return {
         "status": True,
@@ -342,13 +678,16 @@ def delete_account(delete_data: DeleteAccount):
 
 
 @app.get("/api/user/profile/{user_identifier}")
-def get_user_profile(user_identifier: str):
+async def get_user_profile(user_identifier: str):
     """Get user profile information"""
     users_collection = database["users_collection"]
     
-    user = users_collection.find_one(
-        {"phone_or_email": user_identifier},
-        {"_id": 0, "hashed_password": 0}  # Exclude sensitive data
+    user = await document_cache.get_or_load(
+        profile_key(user_identifier),
+        lambda: users_collection.find_one(
+            {"phone_or_email": user_identifier},
+            {"_id": 0, "hashed_password": 0}  # Exclude sensitive data
+        )
     )
     
     if not user:
@@ -364,14 +703,15 @@ def get_user_profile(user_identifier: str):
 
 
 @app.delete("/api/notes/delete/{user_identifier}/{audio_id}")
-def delete_specific_note(user_identifier: str, audio_id: str):
+async def delete_specific_note(user_identifier: str, audio_id: str):
     """Delete a specific note"""
     notes_collection = database["notes_collection"]
     
-    result = notes_collection.update_one(
+    result = await notes_collection.update_one(
         {"user_identifier": user_identifier},
-        {"$unset": {f"notes.{audio_id}": ""}}
+        [{"$unset": [f"notes.{audio_id}"]}, NOTES_SUMMARY_STAGE]
     )
+    await document_cache.invalidate(notes_key(user_identifier))
     
     if result.matched_count == 0:
         raise HTTPException(
@@ -386,11 +726,13 @@ def delete_specific_note(user_identifier: str, audio_id: str):
 
 
 @app.delete("/api/progress/reset/{user_identifier}")
-def reset_progress(user_identifier: str):
+async def reset_progress(user_identifier: str):
     """Reset user progress"""
     progress_collection = database["progress_collection"]
     
-    result = progress_collection.delete_one({"user_identifier": user_identifier})
+    await progress_buffer.discard(user_identifier)
+    result = await progress_collection.delete_one({"user_identifier": user_identifier})
+    await document_cache.invalidate(progress_key(user_identifier))
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -405,20 +747,29 @@ def reset_progress(user_identifier: str):
 
 
 @app.get("/api/stats/{user_identifier}")
-def get_user_stats(user_identifier: str):
+async def get_user_stats(user_identifier: str):
     """Get user statistics (progress and notes count)"""
     progress_collection = database["progress_collection"]
     notes_collection = database["notes_collection"]
     
-    progress_data = progress_collection.find_one({"user_identifier": user_identifier})
-    notes_data = notes_collection.find_one({"user_identifier": user_identifier})
+    if progress_buffer.enabled:
+        await progress_buffer.flush(user_identifier)
+    
+    # Projected reads: only the summary fields leave the server
+    progress_data, notes_data = await asyncio.gather(
+        progress_collection.find_one(
+            {"user_identifier": user_identifier},
+            {"_id": 0, "current_level": 1, "current_week": 1, "updated_at": 1}
+        ),
+        notes_collection.find_one({"user_identifier": user_identifier}, NOTES_COUNT_PROJECTION)
+    )
     
     stats = {
         "user_identifier": user_identifier,
         "has_progress": progress_data is not None,
         "current_level": progress_data.get("current_level") if progress_data else None,
         "current_week": progress_data.get("current_week") if progress_data else None,
-        "notes_count": len(notes_data.get("notes", {})) if notes_data else 0,
+        "notes_count": notes_data.get("notes_count", 0) if notes_data else 0,
         "last_updated": progress_data.get("updated_at") if progress_data else None
     }
     
@@ -426,3 +777,94 @@ def get_user_stats(user_identifier: str):
         "status": True,
         "data": stats
     }
+
+
+"""
+Content Catalog APIS
+"""
+
+@app.get("/api/content/audio")
+async def get_audio_catalog(request: Request):
+    """Serve the audio catalog with ETag revalidation and precompressed bodies"""
+    return catalogs["audio"].response(request)
+
+
+@app.get("/api/content/pdf")
+async def get_pdf_catalog(request: Request):
+    """Serve the books catalog with ETag revalidation and precompressed bodies"""
+    return catalogs["pdf"].response(request)
+
+
+@app.get("/api/content/changes")
+async def get_content_changes(since: Optional[int] = Query(None)):
+    """List weeks and books added, modified or removed since a catalog version"""
+    return {
+        "status": True,
+        **content_manifest.changes_since(since)
+    }
+
+
+"""
+Admin APIS
+"""
+
+@app.get("/api/admin/export", dependencies=[Depends(require_admin)])
+async def export_data(
+    collections: Optional[str] = Query(None),
+    resume_from: Optional[str] = Query(None),
+    compress: Optional[str] = Query(None)
+):
+    """Stream users (without passwords), progress and notes as NDJSON"""
+    try:
+        names = parse_collections(collections)
+        resume_point = parse_resume_from(resume_from)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    chunks = export_lines(database, names, resume_point)
+    filename = f"gsp-export-{datetime.now().strftime('%Y%m%d%H%M%S')}.ndjson"
+    media_type = "application/x-ndjson"
+    if compress == "gzip":
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.post("/api/admin/import", dependencies=[Depends(require_admin)])
+async def import_data(request: Request, batch_size: int = Query(RESTORE_BATCH_SIZE, ge=1, le=10000)):
+    """Restore progress and notes from a streamed NDJSON (optionally gzip) export"""
+    try:
+        report = await restore_lines(database, iter_lines(request.stream()), batch_size)
+        await document_cache.clear()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {
+        "status": True,
+        "data": report.to_dict()
+    }
+
+
+@app.get("/api/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def slow_queries(limit: int = Query(10, ge=1, le=1000)):
+    """Slowest query shapes seen by this worker since startup"""
+    return {
+        "status": True,
+        "data": {
+            "threshold_ms": slow_query_profiler.threshold_ms,
+            "since": datetime.fromtimestamp(slow_query_profiler.started_at).isoformat(),
+            "shapes": slow_query_profiler.top(limit)
+        }
+    }
@@ -0,0 +1,278 @@
+"""
+In-memory stand-in for the async Mongo collections the app uses.
+
+Only the operations and query/update features app.py and utils/coalesce.py
+issue are implemented:
+
+- find_one, insert_one, update_one, find_one_and_update, delete_one,
+  bulk_write (UpdateOne/ReplaceOne);
+- equality and $ne filters, unique indexes (DuplicateKeyError);
+- $set/$unset/$inc updates with dotted paths and pipeline updates using
+  $set/$unset stages with $literal, $ifNull, $mergeObjects, $size,
+  $objectToArray, $add and "$field" references;
+- inclusion/exclusion projections and computed projection fields.
+
+Documents are stored BSON-encoded and decoded on every read, so the
+benchmark pays the same decode cost per byte as with a real driver. An
+optional per-call latency stands in for the network round trip.
+"""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Optional
+import bson
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+_MISSING = object()
+
+
+def _get(document: Dict[str, Any], path: str):
+    value = document
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return _MISSING
+        value = value[key]
+    return value
+
+
+def _set(document: Dict[str, Any], path: str, value):
+    *parents, last = path.split(".")
+    for key in parents:
+        document = document.setdefault(key, {})
+    document[last] = value
+
+
+def _unset(document: Dict[str, Any], path: str):
+    *parents, last = path.split(".")
+    for key in parents:
+        document = document.get(key)
+        if not isinstance(document, dict):
+            return
+    document.pop(last, None)
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for path, condition in query.items():
+        value = _get(document, path)
+        if isinstance(condition, dict) and condition and next(iter(condition)).startswith("$"):
+            for operator, operand in condition.items():
+                if operator == "$ne":
+                    if value is not _MISSING and value == operand:
+                        return False
+                else:
+                    raise NotImplementedError(f"Query operator {operator}")
+        elif value is _MISSING or value != condition:
+            return False
+    return True
+
+
+def evaluate(expression, document: Dict[str, Any]):
+    """Evaluate an aggregation expression against a document"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [evaluate(item, document) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) == 1 and next(iter(expression)).startswith("$"):
+        operator, operand = next(iter(expression.items()))
+        if operator == "$literal":
+            return operand
+        args = evaluate(operand, document)
+        if operator == "$ifNull":
+            return next((arg for arg in args if arg is not None), None)
+        if operator == "$mergeObjects":
+            merged = {}
+            for arg in args:
+                merged.update(arg or {})
+            return merged
+        if operator == "$size":
+            return len(args)
+        if operator == "$objectToArray":
+            return [{"k": key, "v": value} for key, value in args.items()]
+        if operator == "$add":
+            return sum(args)
+        raise NotImplementedError(f"Expression operator {operator}")
+    return {key: evaluate(value, document) for key, value in expression.items()}
+
+
+def apply_update(document: Dict[str, Any], update) -> Dict[str, Any]:
+    if isinstance(update, list):
+        for stage in update:
+            (name, spec), = stage.items()
+            if name == "$set":
+                # Expressions see the document as it was before this stage
+                values = {path: evaluate(expression, document) for path, expression in spec.items()}
+                for path, value in values.items():
+                    _set(document, path, value)
+            elif name == "$unset":
+                for path in ([spec] if isinstance(spec, str) else spec):
+                    _unset(document, path)
+            else:
+                raise NotImplementedError(f"Pipeline stage {name}")
+        return document
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            if operator == "$set":
+                _set(document, path, value)
+            elif operator == "$unset":
+                _unset(document, path)
+            elif operator == "$inc":
+                current = _get(document, path)
+                _set(document, path, (0 if current is _MISSING else current) + value)
+            else:
+                raise NotImplementedError(f"Update operator {operator}")
+    return document
+
+
+def project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return document
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(value in (0, False) for value in fields.values()):
+        result = {key: value for key, value in document.items() if key not in fields}
+    elif fields:
+        result = {}
+        for key, value in fields.items():
+            if value in (1, True):
+                found = _get(document, key)
+                if found is not _MISSING:
+                    _set(result, key, found)
+            else:
+                result[key] = evaluate(value, document)
+        if "_id" in document:
+            result["_id"] = document["_id"]
+    else:
+        result = dict(document)
+    if projection.get("_id", 1) in (0, False):
+        result.pop("_id", None)
+    return result
+
+
+class FakeCollection:
+    """Async collection over BSON-encoded documents, with hash indexes on its unique fields"""
+
+    def __init__(self, name: str, unique: Iterable[str] = (), latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self._documents: Dict[Any, bytes] = {}
+        self._indexes: Dict[str, Dict[Any, Any]] = {field: {} for field in unique}
+
+    async def _round_trip(self):
+        # Always suspend, as a real driver does waiting on its socket
+        await asyncio.sleep(self.latency)
+
+    def _candidates(self, query):
+        for field, index in self._indexes.items():
+            value = query.get(field, _MISSING)
+            if value is not _MISSING and not isinstance(value, dict):
+                return [index[value]] if value in index else []
+        return list(self._documents)
+
+    def _find(self, query):
+        for _id in self._candidates(query):
+            document = bson.decode(self._documents[_id])
+            if matches(document, query):
+                return _id, document
+        return None, None
+
+    def _store(self, previous: Optional[Dict[str, Any]], document: Dict[str, Any]) -> Dict[str, Any]:
+        document.setdefault("_id", bson.ObjectId())
+        _id = document["_id"]
+        for field, index in self._indexes.items():
+            value = _get(document, field)
+            if value is not _MISSING and index.get(value, _id) != _id:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {field}_1")
+        data = bson.encode(document)
+        if previous is not None:
+            self._unindex(previous)
+        for field, index in self._indexes.items():
+            value = _get(document, field)
+            if value is not _MISSING:
+                index[value] = _id
+        self._documents[_id] = data
+        return document
+
+    def _unindex(self, document: Dict[str, Any]):
+        for field, index in self._indexes.items():
+            index.pop(_get(document, field), None)
+
+    def _upsert_document(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        document = {}
+        for path, condition in query.items():
+            if not (isinstance(condition, dict) and any(key.startswith("$") for key in condition)):
+                _set(document, path, condition)
+        return document
+
+    def _update(self, query, update, upsert: bool):
+        """Returns (document before, document after), before is None for an upsert"""
+        _id, document = self._find(query)
+        if document is None:
+            if not upsert:
+                return None, None
+            return None, self._store(None, apply_update(self._upsert_document(query), update))
+        before = bson.decode(self._documents[_id])
+        return before, self._store(before, apply_update(document, update))
+
+    def __len__(self):
+        return len(self._documents)
+
+    async def find_one(self, query=None, projection=None):
+        await self._round_trip()
+        _, document = self._find(query or {})
+        return None if document is None else project(document, projection)
+
+    async def insert_one(self, document):
+        await self._round_trip()
+        stored = self._store(None, dict(document))
+        return SimpleNamespace(inserted_id=stored["_id"])
+
+    async def update_one(self, query, update, upsert: bool = False):
+        await self._round_trip()
+        before, after = self._update(query, update, upsert)
+        matched = 1 if before is not None else 0
+        upserted_id = after["_id"] if after is not None and before is None else None
+        return SimpleNamespace(matched_count=matched, modified_count=matched, upserted_id=upserted_id)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE):
+        await self._round_trip()
+        before, after = self._update(query, update, upsert)
+        document = after if return_document == ReturnDocument.AFTER else before
+        return None if document is None else project(document, projection)
+
+    async def delete_one(self, query):
+        await self._round_trip()
+        _id, document = self._find(query)
+        if document is None:
+            return SimpleNamespace(deleted_count=0)
+        self._unindex(document)
+        del self._documents[_id]
+        return SimpleNamespace(deleted_count=1)
+
+    async def bulk_write(self, requests, ordered: bool = True):
+        await self._round_trip()
+        for request in requests:
+            query, doc, upsert = request._filter, request._doc, request._upsert
+            if isinstance(doc, dict) and doc and not next(iter(doc)).startswith("$"):
+                # ReplaceOne keeps only the _id of the old document
+                _id, previous = self._find(query)
+                if previous is not None:
+                    self._store(previous, {**doc, "_id": _id})
+                elif upsert:
+                    self._store(None, {**self._upsert_document(query), **doc})
+            else:
+                self._update(query, doc, upsert)
+        return SimpleNamespace(acknowledged=True)
+
+
+def fake_database(latency_ms: float = 0.0) -> Dict[str, FakeCollection]:
+    """Collections dict shaped like utils.database.get_collections"""
+    latency = latency_ms / 1000
+    return {
+        "users_collection": FakeCollection("Users", unique=("phone_or_email",), latency=latency),
+        "notes_collection": FakeCollection("Notes", unique=("user_identifier",), latency=latency),
+        "progress_collection": FakeCollection("UserProgress", unique=("user_identifier",), latency=latency),
+    }
@@ -0,0 +1,251 @@
+"""
+Load test driving the ASGI app in process against the in-memory Mongo
+stand-in (benchmarks/fake_mongo.py), with no network involved.
+
+A seeded mix of register, login, progress upload/download, notes
+backup/retrieve and stats requests runs over `--concurrency` concurrent
+clients. The report gives throughput and p50/p95/p99 latency per route.
+
+    python -m benchmarks.load
+    python -m benchmarks.load --save benchmarks/baseline.json
+    python -m benchmarks.load --compare benchmarks/baseline.json
+
+--compare exits with status 1 when a route's p95 is more than
+--tolerance slower than the baseline. Absolute numbers depend on the
+machine, so a baseline is only comparable with runs on similar hardware
+(the report records CPU count and Python version).
+
+The auth rate limiter is switched off, since every request comes from one
+client address; bcrypt runs for real in the hashing pool.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+import httpx
+from benchmarks.fake_mongo import fake_database
+
+
+PASSWORD = "BenchmarkPassword123!"
+
+# name -> (weight, method, path template)
+ROUTES = {
+    "register": (2, "POST", "/api/auth/register"),
+    "login": (3, "POST", "/api/auth/login"),
+    "progress_upload": (20, "POST", "/api/progress/upload"),
+    "progress_download": (30, "GET", "/api/progress/download/{user_identifier}"),
+    "notes_backup": (10, "POST", "/api/notes/backup"),
+    "notes_retrieve": (25, "GET", "/api/notes/retrieve/{user_identifier}"),
+    "stats": (10, "GET", "/api/stats/{user_identifier}"),
+}
+
+
+def progress_tree(rng: random.Random) -> Dict[str, Any]:
+    """Progress for 3 levels x 12 weeks x 7 audios, completed up to a random point"""
+    done = rng.randrange(3 * 12 * 7)
+    tree = {}
+    for level in range(3):
+        tree[f"level{level + 1}"] = {
+            f"week{week + 1}": {
+                f"audio_{audio + 1:03d}": {"completed": (level * 84 + week * 7 + audio) < done, "position": rng.randrange(900)}
+                for audio in range(7)
+            }
+            for week in range(12)
+        }
+    return tree
+
+
+def notes(rng: random.Random) -> Dict[str, str]:
+    return {
+        f"audio_{index:03d}": "Reflection on this week's reading and prayer. " * rng.randint(1, 8)
+        for index in range(rng.randint(5, 80))
+    }
+
+
+def progress_body(rng: random.Random, user: str) -> Dict[str, Any]:
+    return {
+        "user_identifier": user,
+        "progress": progress_tree(rng),
+        "current_level": "level1",
+        "current_week": rng.randint(1, 12),
+        "current_audio": "audio_001",
+    }
+
+
+def build_request(name: str, rng: random.Random, users: List[str], counter: List[int]) -> Tuple[str, str, Dict[str, Any]]:
+    _, method, template = ROUTES[name]
+    user = rng.choice(users)
+    if name == "register":
+        counter[0] += 1
+        return method, template, {"json": {"phone_or_email": f"new{counter[0]}@bench.example", "password": PASSWORD}}
+    if name == "login":
+        return method, template, {"json": {"phone_or_email": user, "password": PASSWORD}}
+    if name == "progress_upload":
+        return method, template, {"json": progress_body(rng, user)}
+    if name == "notes_backup":
+        return method, template, {"json": {"user_identifier": user, "notes": notes(rng)}}
+    return method, template.format(user_identifier=user), {}
+
+
+async def seed(database, rng: random.Random, user_count: int) -> List[str]:
+    """Create users with progress and notes, sharing one precomputed password hash"""
+    from app import notes_update, progress_update
+    from utils.models import NotesBackup, ProgressData
+    from utils.util import get_password_hash
+    hashed_password = get_password_hash(PASSWORD)
+    users = [f"user{index}@bench.example" for index in range(user_count)]
+    for user in users:
+        await database["users_collection"].insert_one({
+            "phone_or_email": user, "hashed_password": hashed_password, "created_at": "2024-01-01T00:00:00"
+        })
+        await database["progress_collection"].update_one(
+            {"user_identifier": user}, progress_update(ProgressData(**progress_body(rng, user))), upsert=True
+        )
+        await database["notes_collection"].update_one(
+            {"user_identifier": user}, notes_update(NotesBackup(user_identifier=user, notes=notes(rng))), upsert=True
+        )
+    return users
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    # Rounded first so float error (0.07 * 100 == 7.000000000000001) can't push the rank up
+    rank = max(math.ceil(round(fraction * len(sorted_values), 9)) - 1, 0)
+    return sorted_values[rank]
+
+
+async def run(requests: int = 1000, concurrency: int = 8, users: int = 200,
+              seed_value: int = 1, mongo_latency_ms: float = 0.0) -> Dict[str, Any]:
+    import app as app_module
+    from utils.cache import document_cache
+    from utils.hashing import hashing_pool
+    from utils.ratelimit import create_limiter
+
+    rng = random.Random(seed_value)
+    database = fake_database(mongo_latency_ms)
+    user_ids = await seed(database, rng, users)
+
+    names = list(ROUTES)
+    weights = [ROUTES[name][0] for name in names]
+    counter = [0]
+    plan = [(name, *build_request(name, rng, user_ids, counter))
+            for name in rng.choices(names, weights=weights, k=requests)]
+
+    previous = app_module.database, app_module.auth_limiter
+    app_module.database = database
+    app_module.auth_limiter = create_limiter("off")
+    await document_cache.clear()
+    hashing_pool.start()
+
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    queue = iter(plan)
+
+    async def client_loop(client: httpx.AsyncClient):
+        for name, method, url, kwargs in queue:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies[name].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[name] += 1
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+    finally:
+        app_module.database, app_module.auth_limiter = previous
+        await document_cache.clear()
+        hashing_pool.shutdown()
+
+    routes = {}
+    for name in names:
+        values = sorted(latencies[name])
+        if not values:
+            continue
+        routes[name] = {
+            "route": f"{ROUTES[name][1]} {ROUTES[name][2]}",
+            "count": len(values),
+            "errors": errors[name],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+    return {
+        "config": {
+            "requests": requests, "concurrency": concurrency, "users": users,
+            "seed": seed_value, "mongo_latency_ms": mongo_latency_ms,
+        },
+        "environment": {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "total": {"requests": requests, "seconds": round(elapsed, 2), "rps": round(requests / elapsed, 1)},
+        "routes": routes,
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None):
+    print(f"{'route':<20} {'count':>6} {'errors':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+          + (f" {'p95 vs base':>12}" if baseline else ""))
+    for name, stats in report["routes"].items():
+        line = (f"{name:<20} {stats['count']:>6} {stats['errors']:>6} {stats['rps']:>8} "
+                f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+        base = (baseline or {}).get("routes", {}).get(name)
+        if base:
+            line += f" {(stats['p95_ms'] / base['p95_ms'] - 1) * 100 if base['p95_ms'] else 0.0:>+11.1f}%"
+        print(line)
+    total = report["total"]
+    print(f"total: {total['requests']} requests in {total['seconds']}s ({total['rps']} req/s)")
+
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Routes whose p95 is more than `tolerance` (a fraction) above the baseline"""
+    slower = []
+    for name, stats in report["routes"].items():
+        base = baseline.get("routes", {}).get(name)
+        if base and base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            slower.append(name)
+    return slower
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description="Load test the app against an in-memory Mongo")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=200, help="seeded users with progress and notes")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for data and request mix")
+    parser.add_argument("--mongo-latency-ms", type=float, default=0.0, help="simulated round trip per Mongo call")
+    parser.add_argument("--save", help="write the report as JSON, e.g. benchmarks/baseline.json")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown before failing --compare")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.requests, args.concurrency, args.users, args.seed, args.mongo_latency_ms))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Saved report to {args.save}")
+    if baseline:
+        slower = regressions(report, baseline, args.tolerance)
+        if slower:
+            print(f"p95 regressed by more than {args.tolerance:.0%}: {', '.join(slower)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,83 @@
+"""
+Serialization cost of a notes/progress download, per KB of payload.
+
+Compares FastAPI's default path for a returned dict (jsonable_encoder then
+the stdlib encoder in JSONResponse) with the pre-encoded NegotiatedResponse
+path the hot read routes use, and MessagePack when it is installed.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --sizes 4,64,512 --repeat 50
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from utils import serialization
+from utils.serialization import dumps
+
+
+def notes_document(size_kb: int):
+    """A stored notes document of roughly size_kb KB once encoded"""
+    notes = {}
+    entry = "Reflection on this week's reading. " * 3
+    while len(notes) * (len(entry) + 16) < size_kb * 1024:
+        notes[f"audio_{len(notes):05d}"] = entry
+    return {
+        "user_identifier": "bench@example.com",
+        "notes": notes,
+        "notes_count": len(notes),
+        "version": 42,
+        "updated_at": datetime(2024, 1, 1, 12, 0, 0),
+    }
+
+
+def time_per_call(fn, content, repeat: int) -> float:
+    """Best-of-5 mean seconds per call"""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn(content)
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best
+
+
+def fastapi_default(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def pre_encoded(content):
+    return dumps(content)
+
+
+def run(sizes, repeat: int):
+    encoders = [("jsonable_encoder+json", fastapi_default), ("orjson", pre_encoded)]
+    if serialization.msgpack is not None:
+        encoders.append(("msgpack", serialization.packb))
+
+    print(f"{'size':>8} " + " ".join(f"{name + ' us/KB':>28}" for name, _ in encoders) + f" {'speedup':>8}")
+    for size_kb in sizes:
+        body = {"status": True, "data": notes_document(size_kb)}
+        kb = len(pre_encoded(body)) / 1024
+        per_kb = [time_per_call(fn, body, repeat) * 1e6 / kb for _, fn in encoders]
+        speedup = per_kb[0] / per_kb[1]
+        print(f"{kb:>6.0f}KB " + " ".join(f"{value:>28.2f}" for value in per_kb) + f" {speedup:>7.1f}x")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization", description="Benchmark download serialization per KB")
+    parser.add_argument("--sizes", default="1,16,128,1024", help="comma separated payload sizes in KB")
+    parser.add_argument("--repeat", type=int, default=20, help="calls per timing round")
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",")]
+    except ValueError:
+        parser.error("--sizes must be comma separated integers")
+    run(sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
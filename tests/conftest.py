@@ -4,13 +4,41 @@ Pytest configuration and shared fixtures
 import pytest
 import sys
 from pathlib import Path
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 
 # Ensure the app module can be imported
 sys.path.insert(0, str(Path(__file__).parent))
 
 
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    """Start every test with an empty verified-token cache"""
+    from utils.token_cache import token_cache
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_document_cache():
+    """Start every test with an empty document cache"""
+    import asyncio
+    from utils.cache import document_cache
+    asyncio.run(document_cache.clear())
+    yield
+    asyncio.run(document_cache.clear())
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start every test with full auth rate limit buckets"""
+    from utils.ratelimit import auth_limiter
+    auth_limiter.clear()
+    yield
+    auth_limiter.clear()
+
+
 @pytest.fixture
 def client():
     """Create a test client for the FastAPI app"""
@@ -20,11 +48,11 @@ def client():
 
 @pytest.fixture
 def mock_database():
-    """Mock database collections with common behaviors"""
+    """Mock async database collections with common behaviors"""
     mock_db = {
-        "users_collection": MagicMock(),
-        "progress_collection": MagicMock(),
-        "notes_collection": MagicMock()
+        "users_collection": AsyncMock(),
+        "progress_collection": AsyncMock(),
+        "notes_collection": AsyncMock()
     }
     
     # Set up default return values
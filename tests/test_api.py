@@ -2,8 +2,13 @@
 Comprehensive API Endpoint Tests
 Testing all endpoints in app.py with 2-3 tests per endpoint
 """
+import asyncio
 import pytest
 from unittest.mock import patch, Mock
+from pymongo.errors import DuplicateKeyError
+from utils.cache import document_cache
+from utils.coalesce import ProgressWriteBuffer
+from utils.ratelimit import MemoryBuckets, RateLimiter
 from utils.util import get_password_hash
 
 
@@ -35,14 +40,18 @@ class TestRegisterEndpoint:
         assert "access_token" in data
         assert data["token_type"] == "bearer"
         assert data["message"] == "User registered successfully"
+        
+        # Duplicates are caught by the unique index, not a lookup
+        mock_database["users_collection"].find_one.assert_not_called()
+        mock_database["users_collection"].insert_one.assert_called_once()
     
     @patch('app.database')
     def test_register_duplicate_user(self, mock_db, client, sample_user, mock_database):
         """Test registration fails when user already exists"""
         mock_db.__getitem__.side_effect = mock_database.__getitem__
-        mock_database["users_collection"].find_one.return_value = {
-            "phone_or_email": sample_user["phone_or_email"]
-        }
+        mock_database["users_collection"].insert_one.side_effect = DuplicateKeyError(
+            "E11000 duplicate key error collection: GSP.Users index: phone_or_email_1"
+        )
         
         response = client.post("/api/auth/register", json=sample_user)
         
@@ -84,6 +93,41 @@ class TestLoginEndpoint:
         assert response.status_code == 401
         assert "Incorrect phone/email or password" in response.json()["detail"]
     
+    @patch('app.hashing_pool.max_pending', 0)
+    @patch('app.database')
+    def test_login_rejected_when_hashing_pool_full(self, mock_db, client, sample_user, mock_database):
+        """Test login fails fast with 503 when the bcrypt pool is saturated"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["users_collection"].find_one.return_value = {
+            "phone_or_email": sample_user["phone_or_email"],
+            "hashed_password": get_password_hash(sample_user["password"])
+        }
+        
+        response = client.post("/api/auth/login", json=sample_user)
+        
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    
+    @patch('app.check_password')
+    @patch('app.database')
+    def test_login_rate_limited_before_bcrypt(self, mock_db, mock_check, client, sample_user, mock_database):
+        """Test repeated logins for one account get 429 without checking the password"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["users_collection"].find_one.return_value = {
+            "phone_or_email": sample_user["phone_or_email"],
+            "hashed_password": "hash"
+        }
+        mock_check.return_value = False
+        
+        with patch('app.auth_limiter', RateLimiter(MemoryBuckets(), identifier_burst=2)):
+            statuses = [client.post("/api/auth/login", json=sample_user).status_code for _ in range(3)]
+            response = client.post("/api/auth/login", json=sample_user)
+        
+        assert statuses == [401, 401, 429]
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+        assert mock_check.call_count == 2
+    
     @patch('app.database')
     def test_login_user_not_found(self, mock_db, client, sample_user, mock_database):
         """Test login fails when user doesn't exist"""
@@ -125,6 +169,75 @@ class TestProgressUploadEndpoint:
         assert "Failed to upload progress" in response.json()["detail"]
 
 
+    @patch('app.database')
+    def test_upload_progress_coalesced(self, mock_db, client, sample_progress, mock_database):
+        """Test uploads go through one bulk_write when coalescing is enabled"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        
+        with patch('app.progress_buffer', ProgressWriteBuffer(mode="sync", window_ms=1)):
+            response = client.post("/api/progress/upload", json=sample_progress)
+        
+        assert response.status_code == 200
+        mock_database["progress_collection"].update_one.assert_not_called()
+        mock_database["progress_collection"].bulk_write.assert_called_once()
+
+
+class TestProgressPatchEndpoint:
+    """Tests for /api/progress/patch"""
+    
+    @patch('app.database')
+    def test_patch_progress_success(self, mock_db, client, mock_database):
+        """Test path operations become targeted $set/$unset and return the version"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["progress_collection"].find_one_and_update.return_value = {"version": 7}
+        
+        response = client.post("/api/progress/patch", json={
+            "user_identifier": "test@example.com",
+            "operations": [
+                {"op": "set", "path": ["level1", "week2", "audio_003"], "value": {"completed": True}},
+                {"op": "unset", "path": ["level1", "week1"]}
+            ],
+            "current_week": 2
+        })
+        
+        assert response.status_code == 200
+        assert response.json()["version"] == 7
+        query, update = mock_database["progress_collection"].find_one_and_update.call_args.args
+        assert query == {"user_identifier": "test@example.com"}
+        assert update["$set"]["progress.level1.week2.audio_003"] == {"completed": True}
+        assert update["$set"]["current_week"] == 2
+        assert update["$unset"] == {"progress.level1.week1": ""}
+        assert update["$inc"] == {"version": 1}
+    
+    @patch('app.database')
+    def test_patch_progress_version_conflict(self, mock_db, client, mock_database):
+        """Test a stale base_version is rejected with 409"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["progress_collection"].find_one_and_update.return_value = None
+        
+        response = client.post("/api/progress/patch", json={
+            "user_identifier": "test@example.com",
+            "base_version": 3,
+            "operations": [{"op": "set", "path": ["level1"], "value": {}}]
+        })
+        
+        assert response.status_code == 409
+        assert mock_database["progress_collection"].find_one_and_update.call_args.kwargs["upsert"] is False
+    
+    def test_patch_progress_rejects_invalid_paths(self, client):
+        """Test operator keys and overlapping paths are rejected before hitting Mongo"""
+        for operations in (
+            [{"op": "set", "path": ["$where"], "value": 1}],
+            [{"op": "set", "path": ["level1"], "value": {}}, {"op": "unset", "path": ["level1", "week1"]}]
+        ):
+            response = client.post("/api/progress/patch", json={
+                "user_identifier": "test@example.com",
+                "operations": operations
+            })
+            
+            assert response.status_code == 422
+
+
 class TestProgressDownloadEndpoint:
     """Tests for /api/progress/download/{user_identifier}"""
     
@@ -141,6 +254,45 @@ class TestProgressDownloadEndpoint:
         assert data["status"] is True
         assert data["data"]["user_identifier"] == sample_progress["user_identifier"]
     
+    @patch('app.database')
+    def test_download_progress_not_modified(self, mock_db, client, sample_progress, mock_database):
+        """Test a matching If-None-Match is answered from a projected version read"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["progress_collection"].find_one.return_value = {**sample_progress, "version": 3}
+        etag = client.get(f"/api/progress/download/{sample_progress['user_identifier']}").headers["ETag"]
+        asyncio.run(document_cache.clear())
+        mock_database["progress_collection"].find_one.reset_mock()
+        mock_database["progress_collection"].find_one.return_value = {
+            "version": 3, "updated_at": sample_progress["updated_at"]
+        }
+        
+        response = client.get(
+            f"/api/progress/download/{sample_progress['user_identifier']}",
+            headers={"If-None-Match": etag}
+        )
+        
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        mock_database["progress_collection"].find_one.assert_called_once_with(
+            {"user_identifier": sample_progress["user_identifier"]},
+            {"_id": 0, "version": 1, "updated_at": 1}
+        )
+    
+    @patch('app.database')
+    def test_download_progress_served_from_cache_until_upload(self, mock_db, client, sample_progress, mock_database):
+        """Test repeat downloads hit the cache and an upload invalidates it"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["progress_collection"].find_one.return_value = sample_progress
+        url = f"/api/progress/download/{sample_progress['user_identifier']}"
+        
+        assert client.get(url).status_code == 200
+        assert client.get(url).status_code == 200
+        assert mock_database["progress_collection"].find_one.call_count == 1
+        
+        client.post("/api/progress/upload", json=sample_progress)
+        assert client.get(url).status_code == 200
+        assert mock_database["progress_collection"].find_one.call_count == 2
+    
     @patch('app.database')
     def test_download_progress_not_found(self, mock_db, client, mock_database):
         """Test progress download when no data exists"""
@@ -167,8 +319,10 @@ class TestNotesBackupEndpoint:
         assert data["status"] is True
         assert data["message"] == "Notes backed up successfully"
         
-        # Verify upsert was called
+        # Verify upsert was called with the denormalized count
         mock_database["notes_collection"].update_one.assert_called_once()
+        update = mock_database["notes_collection"].update_one.call_args.args[1]
+        assert update["$set"]["notes_count"] == 2
     
     @patch('app.database')
     def test_backup_notes_database_error(self, mock_db, client, sample_notes, mock_database):
@@ -182,6 +336,57 @@ class TestNotesBackupEndpoint:
         assert "Failed to backup notes" in response.json()["detail"]
 
 
+class TestNotesBatchEndpoint:
+    """Tests for /api/notes/batch"""
+    
+    @patch('app.database')
+    def test_batch_notes_success(self, mock_db, client, mock_database):
+        """Test upserts and deletes are applied as notes.<audio_id> paths in one update"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["notes_collection"].find_one_and_update.return_value = {"version": 4}
+        
+        response = client.post("/api/notes/batch", json={
+            "user_identifier": "test@example.com",
+            "upserts": [
+                {"user_identifier": "test@example.com", "audio_id": "audio_003", "note_text": "Third note"}
+            ],
+            "deletes": ["audio_001"]
+        })
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["upserted"] == 1 and data["deleted"] == 1 and data["version"] == 4
+        mock_database["notes_collection"].find_one_and_update.assert_called_once()
+        query, pipeline = mock_database["notes_collection"].find_one_and_update.call_args.args
+        assert query == {"user_identifier": "test@example.com"}
+        assert pipeline[0]["$set"]["notes"]["$mergeObjects"][1] == {"$literal": {"audio_003": "Third note"}}
+        assert pipeline[1] == {"$unset": ["notes.audio_001"]}
+        assert "notes_count" in pipeline[-1]["$set"]
+    
+    def test_batch_notes_rejects_conflicting_ops(self, client):
+        """Test the same audio_id cannot be upserted and deleted in one batch"""
+        response = client.post("/api/notes/batch", json={
+            "user_identifier": "test@example.com",
+            "upserts": [
+                {"user_identifier": "test@example.com", "audio_id": "audio_001", "note_text": "Note"}
+            ],
+            "deletes": ["audio_001"]
+        })
+        
+        assert response.status_code == 422
+    
+    def test_batch_notes_rejects_other_users_notes(self, client):
+        """Test notes for a different user_identifier are rejected"""
+        response = client.post("/api/notes/batch", json={
+            "user_identifier": "test@example.com",
+            "upserts": [
+                {"user_identifier": "other@example.com", "audio_id": "audio_001", "note_text": "Note"}
+            ]
+        })
+        
+        assert response.status_code == 422
+
+
 class TestNotesRetrieveEndpoint:
     """Tests for /api/notes/retrieve/{user_identifier}"""
     
@@ -198,6 +403,21 @@ class TestNotesRetrieveEndpoint:
         assert data["status"] is True
         assert data["data"]["user_identifier"] == sample_notes["user_identifier"]
     
+    @patch('app.database')
+    def test_retrieve_notes_stale_etag_returns_notes(self, mock_db, client, sample_notes, mock_database):
+        """Test an outdated If-None-Match still returns the full notes"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["notes_collection"].find_one.return_value = {**sample_notes, "version": 5}
+        
+        response = client.get(
+            f"/api/notes/retrieve/{sample_notes['user_identifier']}",
+            headers={"If-None-Match": 'W/"outdated"'}
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["data"]["notes"] == sample_notes["notes"]
+        assert response.headers["ETag"] != 'W/"outdated"'
+    
     @patch('app.database')
     def test_retrieve_notes_not_found(self, mock_db, client, mock_database):
         """Test notes retrieval when no notes exist"""
@@ -212,6 +432,58 @@ class TestNotesRetrieveEndpoint:
         assert "No notes found" in data["data"]["message"]
 
 
+class TestSyncEndpoint:
+    """Tests for /api/sync"""
+    
+    @patch('app.database')
+    def test_sync_uploads_progress_and_returns_newer_notes(self, mock_db, client, sample_progress, sample_notes, mock_database):
+        """Test progress is written while notes newer than the client's version come back"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["progress_collection"].find_one_and_update.return_value = {"version": 8}
+        mock_database["notes_collection"].find_one.return_value = {**sample_notes, "version": 3}
+        
+        response = client.post("/api/sync", json={
+            "user_identifier": "test@example.com",
+            "progress": sample_progress,
+            "notes_version": 2
+        })
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["progress"] == {"version": 8, "changed": False}
+        assert data["notes"]["changed"] is True
+        assert data["notes"]["data"]["notes"] == sample_notes["notes"]
+        mock_database["notes_collection"].find_one.assert_called_once_with(
+            {"user_identifier": "test@example.com", "version": {"$ne": 2}},
+            {"_id": 0}
+        )
+    
+    @patch('app.database')
+    def test_sync_up_to_date_client_gets_nothing(self, mock_db, client, mock_database):
+        """Test a client on the latest versions receives no documents"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        
+        response = client.post("/api/sync", json={
+            "user_identifier": "test@example.com",
+            "progress_version": 5,
+            "notes_version": 2
+        })
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["progress"] == {"version": 5, "changed": False}
+        assert data["notes"] == {"version": 2, "changed": False}
+    
+    def test_sync_rejects_payload_for_other_user(self, client, sample_notes):
+        """Test payloads must belong to the syncing user"""
+        response = client.post("/api/sync", json={
+            "user_identifier": "other@example.com",
+            "notes": sample_notes
+        })
+        
+        assert response.status_code == 422
+
+
 class TestVerifyTokenEndpoint:
     """Tests for /api/auth/verify"""
     
@@ -445,10 +717,7 @@ class TestUserStatsEndpoint:
             "current_week": 2,
             "updated_at": "2026-01-28T12:00:00"
         }
-        mock_database["notes_collection"].find_one.return_value = {
-            "user_identifier": "test@example.com",
-            "notes": {"audio_001": "Note 1", "audio_002": "Note 2"}
-        }
+        mock_database["notes_collection"].find_one.return_value = {"notes_count": 2}
         
         response = client.get("/api/stats/test@example.com")
         
@@ -458,6 +727,10 @@ class TestUserStatsEndpoint:
         assert data["data"]["has_progress"] is True
         assert data["data"]["current_level"] == "level1"
         assert data["data"]["notes_count"] == 2
+        
+        # Only the summary fields are read, never the notes themselves
+        projection = mock_database["notes_collection"].find_one.call_args.args[1]
+        assert set(projection) == {"_id", "notes_count"}
     
     @patch('app.database')
     def test_get_stats_without_data(self, mock_db, client, mock_database):
@@ -470,4 +743,57 @@ class TestUserStatsEndpoint:
         data = response.json()
         assert data["status"] is True
         assert data["data"]["has_progress"] is False
-        assert data["data"]["notes_count"] == 0
\ No newline at end of file
+        assert data["data"]["notes_count"] == 0
+
+class TestContentCatalogEndpoint:
+    """Tests for /api/content/audio and /api/content/pdf"""
+    
+    def test_audio_catalog_returns_content_with_etag(self, client):
+        """Test audio catalog is served gzip-encoded with a strong ETag"""
+        response = client.get("/api/content/audio", headers={"Accept-Encoding": "gzip"})
+        
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["ETag"].startswith('"')
+        assert set(response.json()) == {"beginners", "intermediary", "advanced"}
+    
+    def test_pdf_catalog_not_modified(self, client):
+        """Test a matching If-None-Match returns 304 with no body"""
+        etag = client.get("/api/content/pdf").headers["ETag"]
+        
+        response = client.get("/api/content/pdf", headers={"If-None-Match": etag})
+        
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+    
+    def test_catalog_identity_when_no_encoding_accepted(self, client):
+        """Test the uncompressed body is sent when the client accepts no encoding"""
+        response = client.get("/api/content/pdf", headers={"Accept-Encoding": "identity"})
+        
+        assert response.status_code == 200
+        assert "Content-Encoding" not in response.headers
+        assert "beginner" in response.json()
+
+
+class TestContentChangesEndpoint:
+    """Tests for /api/content/changes"""
+    
+    def test_changes_since_current_version_is_empty(self, client):
+        """Test a client on the current version receives no changes"""
+        version = client.get("/api/content/audio").headers["X-Content-Version"]
+        
+        response = client.get(f"/api/content/changes?since={version}")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] is True
+        assert data["full"] is False
+        assert data["changes"] == {}
+    
+    def test_changes_without_version_requests_full_sync(self, client):
+        """Test a client without a known version is told to refetch everything"""
+        response = client.get("/api/content/changes")
+        
+        assert response.status_code == 200
+        assert response.json()["full"] is True
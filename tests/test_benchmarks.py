@@ -0,0 +1,95 @@
+"""
+Tests for the benchmark suite's Mongo stand-in and load driver
+"""
+import asyncio
+from unittest.mock import patch
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+import pytest
+from app import NOTES_COUNT_PROJECTION, NOTES_SUMMARY_STAGE
+from benchmarks import load
+from benchmarks.fake_mongo import fake_database
+
+
+class TestFakeMongo:
+    """Tests for benchmarks.fake_mongo against the updates app.py issues"""
+
+    def test_pipeline_update_and_count_projection(self):
+        """Test the notes batch pipeline and the stats projection"""
+        notes = fake_database()["notes_collection"]
+
+        async def run():
+            await notes.update_one(
+                {"user_identifier": "a"},
+                {"$set": {"notes": {"audio_001": "One", "audio_002": "Two"}}, "$inc": {"version": 1}},
+                upsert=True
+            )
+            result = await notes.find_one_and_update(
+                {"user_identifier": "a"},
+                [
+                    {"$set": {"notes": {"$mergeObjects": [{"$ifNull": ["$notes", {}]}, {"$literal": {"audio_003": "Three"}}]}}},
+                    {"$unset": ["notes.audio_001"]},
+                    NOTES_SUMMARY_STAGE
+                ],
+                projection={"_id": 0, "version": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return result, await notes.find_one({"user_identifier": "a"}, NOTES_COUNT_PROJECTION)
+        result, count = asyncio.run(run())
+
+        assert result == {"version": 2}
+        assert count == {"notes_count": 2}
+
+    def test_unique_index_and_version_filter(self):
+        """Test duplicate keys are refused and $ne filters match"""
+        database = fake_database()
+
+        async def run():
+            users = database["users_collection"]
+            await users.insert_one({"phone_or_email": "a"})
+            with pytest.raises(DuplicateKeyError):
+                await users.insert_one({"phone_or_email": "a"})
+            progress = database["progress_collection"]
+            await progress.bulk_write([UpdateOne({"user_identifier": "a"}, {"$inc": {"version": 1}}, upsert=True)])
+            unchanged = await progress.find_one({"user_identifier": "a", "version": {"$ne": 1}})
+            changed = await progress.find_one({"user_identifier": "a", "version": {"$ne": 0}}, {"_id": 0})
+            return unchanged, changed
+        unchanged, changed = asyncio.run(run())
+
+        assert unchanged is None
+        assert changed == {"user_identifier": "a", "version": 1}
+
+
+class TestLoadDriver:
+    """Smoke test for benchmarks.load"""
+
+    def test_mix_runs_without_errors(self):
+        """Test a short read/write mix completes and reports every route"""
+        routes = {name: spec for name, spec in load.ROUTES.items() if name not in ("register", "login")}
+
+        with patch.object(load, "ROUTES", routes):
+            report = asyncio.run(load.run(requests=60, concurrency=4, users=5))
+
+        assert report["total"]["requests"] == 60
+        assert set(report["routes"]) <= set(routes)
+        assert all(stats["errors"] == 0 for stats in report["routes"].values())
+        assert all(stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] for stats in report["routes"].values())
+
+    def test_nearest_rank_percentile(self):
+        """Test percentiles pick the ceil(p * n)-th value"""
+        values = [float(value) for value in range(1, 101)]
+
+        assert load.percentile(values, 0.50) == 50.0
+        assert load.percentile(values, 0.95) == 95.0
+        assert load.percentile(values, 0.99) == 99.0
+        assert load.percentile(values, 0.07) == 7.0
+        assert load.percentile([3.0], 0.99) == 3.0
+        assert load.percentile([], 0.5) == 0.0
+
+    def test_regressions_past_tolerance(self):
+        """Test only routes slower than the tolerance are flagged"""
+        baseline = {"routes": {"stats": {"p95_ms": 10.0}, "login": {"p95_ms": 100.0}}}
+        report = {"routes": {"stats": {"p95_ms": 13.0}, "login": {"p95_ms": 110.0}}}
+
+        assert load.regressions(report, baseline, 0.25) == ["stats"]
@@ -0,0 +1,185 @@
+"""
+Tests for the read-through document cache
+"""
+import asyncio
+from unittest.mock import patch
+import httpx
+from benchmarks.fake_mongo import fake_database
+from utils.cache import MISS, MemoryBackend, ReadThroughCache, SharedBackend, create_cache
+
+
+class FakeSharedClient:
+    """In-memory stand-in for a Redis client"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class TestMemoryBackend:
+    """Tests for utils.cache.MemoryBackend"""
+
+    def test_entries_expire_after_ttl(self):
+        """Test an entry is a miss once its TTL has passed"""
+        now = [0.0]
+        backend = MemoryBackend(max_bytes=1024, clock=lambda: now[0])
+
+        async def run():
+            await backend.set("progress:a", {"version": 1}, ttl=10)
+            assert await backend.get("progress:a") == {"version": 1}
+            now[0] = 10.0
+            assert await backend.get("progress:a") is MISS
+        asyncio.run(run())
+
+        assert backend.size_bytes == 0
+
+    def test_least_recently_used_evicted_past_byte_budget(self):
+        """Test the byte cap evicts the least recently used documents"""
+        backend = MemoryBackend(max_bytes=200)
+        document = {"notes": {"audio_001": "x" * 40}}
+
+        async def run():
+            await backend.set("a", document, ttl=60)
+            await backend.set("b", document, ttl=60)
+            await backend.get("a")
+            await backend.set("c", document, ttl=60)
+            return [await backend.get(key) is MISS for key in ("a", "b", "c")]
+
+        assert asyncio.run(run()) == [False, True, False]
+        assert backend.size_bytes <= 200
+
+
+class TestReadThroughCache:
+    """Tests for utils.cache.ReadThroughCache"""
+
+    def test_loader_runs_once_and_none_is_cached(self):
+        """Test misses load once, including documents that don't exist"""
+        cache = ReadThroughCache(MemoryBackend())
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return None
+
+        async def run():
+            await cache.get_or_load("profile:a", loader)
+            return await cache.get_or_load("profile:a", loader)
+
+        assert asyncio.run(run()) is None
+        assert len(calls) == 1
+        assert cache.stats()["hit_rate"] == 0.5
+
+    def test_shared_backend_round_trip_and_invalidate(self):
+        """Test the shared backend stores encoded documents and honours invalidation"""
+        client = FakeSharedClient()
+        cache = ReadThroughCache(SharedBackend(client))
+
+        async def run():
+            await cache.set("notes:a", {"notes": {"audio_001": "Note"}, "version": 2})
+            cached = await cache.get("notes:a")
+            await cache.invalidate("notes:a")
+            return cached, await cache.get("notes:a")
+
+        cached, after = asyncio.run(run())
+        assert cached == {"notes": {"audio_001": "Note"}, "version": 2}
+        assert after is MISS
+        assert list(client.data) == []
+
+    def test_load_racing_invalidate_is_not_stored(self):
+        """Test a slow load that read before a write does not cache the old document"""
+        cache = ReadThroughCache(MemoryBackend())
+
+        async def run():
+            read_done = asyncio.Event()
+            written = asyncio.Event()
+
+            async def slow_loader():
+                read_done.set()
+                await written.wait()
+                return {"current_level": "old"}
+
+            load = asyncio.ensure_future(cache.get_or_load("progress:a", slow_loader))
+            await read_done.wait()
+            await cache.invalidate("progress:a")  # the write lands after the load's read
+            written.set()
+            loaded = await load
+            return loaded, await cache.get("progress:a")
+
+        loaded, cached = asyncio.run(run())
+        assert loaded == {"current_level": "old"}
+        assert cached is MISS
+
+    def test_generations_survive_eviction(self):
+        """Test dropping old generations never lets a stale load through"""
+        cache = ReadThroughCache(MemoryBackend(), max_generations=1)
+
+        async def run():
+            generation = cache.generation("progress:a")
+            await cache.invalidate("progress:a")
+            await cache.invalidate("progress:b")  # evicts progress:a's generation
+            await cache.set("progress:a", {"current_level": "old"}, generation)
+            return await cache.get("progress:a")
+
+        assert asyncio.run(run()) is MISS
+
+    def test_off_backend_never_caches(self):
+        """Test the cache can be switched off"""
+        cache = create_cache("off")
+
+        async def run():
+            await cache.set("profile:a", {"phone_or_email": "a"})
+            return await cache.get("profile:a")
+
+        assert asyncio.run(run()) is MISS
+        assert cache.stats()["enabled"] is False
+
+
+class TestDownloadUploadRace:
+    """Tests for downloads racing uploads of the same user's progress"""
+
+    def test_download_after_upload_sees_the_upload(self, sample_progress):
+        """Test a download that missed the cache before an upload doesn't cache the old document"""
+        database = fake_database()
+        user = sample_progress["user_identifier"]
+        progress_collection = database["progress_collection"]
+        find_one = progress_collection.find_one
+
+        async def run():
+            from app import app
+            await progress_collection.insert_one({"user_identifier": user, "current_level": "old", "version": 1})
+            reading = asyncio.Event()
+            upload_done = asyncio.Event()
+
+            async def slow_find_one(*args, **kwargs):
+                document = await find_one(*args, **kwargs)
+                if not upload_done.is_set():
+                    reading.set()
+                    await upload_done.wait()
+                return document
+            progress_collection.find_one = slow_find_one
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                download = asyncio.ensure_future(client.get(f"/api/progress/download/{user}"))
+                await reading.wait()
+                upload = await client.post("/api/progress/upload", json={**sample_progress, "current_level": "new"})
+                upload_done.set()
+                stale = await download
+                fresh = await client.get(f"/api/progress/download/{user}")
+            return upload, stale, fresh
+
+        with patch("app.database", database):
+            upload, stale, fresh = asyncio.run(run())
+
+        assert upload.status_code == 200
+        assert stale.json()["data"]["current_level"] == "old"
+        assert fresh.json()["data"]["current_level"] == "new"
@@ -0,0 +1,132 @@
+"""
+Tests for the progress upload coalescing buffer
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from pymongo.errors import BulkWriteError
+from utils.cache import MISS, document_cache, progress_key
+from utils.coalesce import ProgressWriteBuffer
+
+
+def _update(week):
+    return {"$set": {"current_week": week}, "$inc": {"version": 1}}
+
+
+class TestProgressWriteBuffer:
+    """Tests for utils.coalesce.ProgressWriteBuffer"""
+
+    def test_sync_mode_coalesces_uploads_into_one_bulk_write(self):
+        """Test repeated uploads per user become one unordered bulk_write with the latest update"""
+        collection = AsyncMock()
+        buffer = ProgressWriteBuffer(mode="sync", window_ms=10, max_pending=100)
+
+        async def run():
+            await asyncio.gather(
+                buffer.submit(collection, "a@example.com", _update(1)),
+                buffer.submit(collection, "a@example.com", _update(2)),
+                buffer.submit(collection, "b@example.com", _update(5))
+            )
+        asyncio.run(run())
+
+        collection.bulk_write.assert_awaited_once()
+        requests = collection.bulk_write.call_args.args[0]
+        assert collection.bulk_write.call_args.kwargs == {"ordered": False}
+        assert [request._filter for request in requests] == [
+            {"user_identifier": "a@example.com"}, {"user_identifier": "b@example.com"}
+        ]
+        assert requests[0]._doc == _update(2)
+        assert (buffer.submitted, buffer.written) == (3, 2)
+
+    def test_sync_mode_surfaces_write_errors(self):
+        """Test a failed write is raised to the waiting request only"""
+        collection = AsyncMock()
+        collection.bulk_write.side_effect = BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "boom"}]})
+        buffer = ProgressWriteBuffer(mode="sync", window_ms=10, max_pending=100)
+
+        async def run():
+            return await asyncio.gather(
+                buffer.submit(collection, "a@example.com", _update(1)),
+                buffer.submit(collection, "b@example.com", _update(1)),
+                return_exceptions=True
+            )
+        results = asyncio.run(run())
+
+        assert results[0] is None
+        assert isinstance(results[1], BulkWriteError)
+
+    def test_discard_drops_pending_upload(self):
+        """Test a reset drops the buffered upload so it is never written"""
+        collection = AsyncMock()
+        buffer = ProgressWriteBuffer(mode="async", window_ms=10000, max_pending=100)
+
+        async def run():
+            await buffer.submit(collection, "a@example.com", _update(1))
+            assert buffer.has_pending("a@example.com")
+            await buffer.discard("a@example.com")
+            await buffer.flush()
+        asyncio.run(run())
+
+        collection.bulk_write.assert_not_awaited()
+
+    def test_readers_wait_for_in_flight_flush_and_cache_is_invalidated(self):
+        """Test a read during a timer flush waits for the write and sees no stale cache entry"""
+        collection = AsyncMock()
+        buffer = ProgressWriteBuffer(mode="async", window_ms=1, max_pending=100)
+        order = []
+
+        async def run():
+            gate = asyncio.Event()
+
+            async def slow_write(requests, ordered):
+                await gate.wait()
+                order.append("written")
+            collection.bulk_write.side_effect = slow_write
+
+            await buffer.submit(collection, "a@example.com", _update(2))
+            await asyncio.sleep(0.01)  # the timer flush has taken the upload
+            assert not buffer.has_pending("a@example.com")
+            # A download racing the flush cached the old document
+            await document_cache.set(progress_key("a@example.com"), {"current_week": 1})
+
+            reader = asyncio.ensure_future(buffer.flush("a@example.com"))
+            await asyncio.sleep(0)
+            assert not reader.done()
+            gate.set()
+            await reader
+            order.append("read")
+            return await document_cache.get(progress_key("a@example.com"))
+        cached = asyncio.run(run())
+
+        assert order == ["written", "read"]
+        assert cached is MISS
+
+    def test_reader_does_not_wait_for_other_users_flush(self):
+        """Test only a user's own in-flight batch holds up their read"""
+        collection = AsyncMock()
+        buffer = ProgressWriteBuffer(mode="async", window_ms=1, max_pending=100)
+
+        async def run():
+            gate = asyncio.Event()
+
+            async def slow_write(requests, ordered):
+                await gate.wait()
+            collection.bulk_write.side_effect = slow_write
+
+            await buffer.submit(collection, "a@example.com", _update(2))
+            await asyncio.sleep(0.01)  # the timer flush is writing a@example.com
+            other = asyncio.ensure_future(buffer.flush("b@example.com"))
+            own = asyncio.ensure_future(buffer.flush("a@example.com"))
+            await asyncio.sleep(0)
+            state = other.done(), own.done()
+            gate.set()
+            await own
+            await buffer.flush()
+            return state
+
+        assert asyncio.run(run()) == (True, False)
+
+    def test_unknown_mode_is_rejected(self):
+        """Test misconfigured modes fail fast"""
+        with pytest.raises(ValueError):
+            ProgressWriteBuffer(mode="later")
@@ -0,0 +1,94 @@
+"""
+Tests for request/response compression on the progress and notes routes
+"""
+import gzip
+import json
+import pytest
+from unittest.mock import patch
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class TestRequestDecompression:
+    """Tests for gzip-encoded request bodies"""
+
+    @patch('app.database')
+    def test_gzip_upload_is_decoded(self, mock_db, client, sample_progress, mock_database):
+        """Test a gzip request body reaches the handler as plain JSON"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+
+        response = client.post(
+            "/api/progress/upload",
+            content=gzip.compress(json.dumps(sample_progress).encode()),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+
+        assert response.status_code == 200
+        update = mock_database["progress_collection"].update_one.call_args.args[1]
+        assert update["$set"]["progress"] == sample_progress["progress"]
+
+    def test_zip_bomb_is_rejected(self, client, sample_notes):
+        """Test bodies inflating past the cap are refused with 413"""
+        notes = {**sample_notes, "notes": {"audio_001": "x" * (9 * 1024 * 1024)}}
+
+        response = client.post(
+            "/api/notes/backup",
+            content=gzip.compress(json.dumps(notes).encode()),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+
+        assert response.status_code == 413
+
+    def test_corrupt_gzip_is_rejected(self, client):
+        """Test undecodable gzip bodies are a 400"""
+        response = client.post(
+            "/api/notes/backup",
+            content=b"\x1f\x8bnot really gzip",
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+
+        assert response.status_code == 400
+
+
+class TestResponseCompression:
+    """Tests for negotiated response compression"""
+
+    @patch('app.database')
+    def test_large_download_is_compressed(self, mock_db, client, sample_notes, mock_database):
+        """Test large notes responses are compressed for clients accepting gzip"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        notes = {f"audio_{i:03}": "A fairly long note about this audio " * 5 for i in range(50)}
+        mock_database["notes_collection"].find_one.return_value = {**sample_notes, "notes": notes}
+
+        response = client.get("/api/notes/retrieve/test@example.com", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert response.json()["data"]["notes"] == notes
+
+    @pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+    @patch('app.database')
+    def test_brotli_preferred_when_accepted(self, mock_db, client, sample_notes, mock_database):
+        """Test br is picked over gzip when the client accepts both"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        notes = {f"audio_{i:03}": "A fairly long note about this audio " * 5 for i in range(50)}
+        mock_database["notes_collection"].find_one.return_value = {**sample_notes, "notes": notes}
+
+        response = client.get("/api/notes/retrieve/test@example.com", headers={"Accept-Encoding": "gzip, br"})
+
+        assert response.headers["Content-Encoding"] == "br"
+        assert response.json()["data"]["notes"] == notes
+
+    @patch('app.database')
+    def test_small_response_is_not_compressed(self, mock_db, client, sample_progress, mock_database):
+        """Test responses under the size threshold are sent as is"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+
+        response = client.post("/api/progress/upload", json=sample_progress, headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert "Content-Encoding" not in response.headers
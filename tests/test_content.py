@@ -0,0 +1,65 @@
+"""
+Tests for the content catalog manifest and delta sync
+"""
+import copy
+from utils.content import Catalog, ContentManifest, _digest, build_manifest, load_catalogs
+
+
+def _history(catalogs, version=1):
+    manifest = build_manifest(catalogs)
+    return [{"version": version, "digest": _digest(manifest), "manifest": manifest}]
+
+
+class TestContentManifest:
+    """Tests for utils.content.ContentManifest"""
+
+    def test_unchanged_content_keeps_recorded_version(self):
+        """Test matching files are served as the recorded version with no changes"""
+        catalogs = load_catalogs()
+        manifest = ContentManifest(catalogs, _history(catalogs, version=4))
+
+        assert manifest.version == 4
+        assert manifest.changes_since(4) == {"version": 4, "since": 4, "full": False, "changes": {}}
+
+    def test_changes_since_lists_only_changed_items(self):
+        """Test delta contains modified weeks, added books and removed levels only"""
+        old_catalogs = load_catalogs()
+        history = _history(old_catalogs)
+
+        audio = copy.deepcopy(old_catalogs["audio"].data)
+        audio["beginners"]["weeks"][1]["audios"][0]["title"] = "Renamed"
+        del audio["advanced"]
+        pdf = copy.deepcopy(old_catalogs["pdf"].data)
+        pdf["beginner"]["books"].append({"id": "bg_new", "title": "New book"})
+        manifest = ContentManifest({"audio": Catalog("audio", audio), "pdf": Catalog("pdf", pdf)}, history)
+
+        result = manifest.changes_since(1)
+
+        assert result["version"] == 2 and result["full"] is False
+        beginners = result["changes"]["audio"]["beginners"]
+        assert [week["weekNumber"] for week in beginners["weeks"]["modified"]] == [2]
+        assert beginners["weeks"]["added"] == [] and "meta" not in beginners
+        assert result["changes"]["audio"]["advanced"] == {"status": "removed"}
+        assert "intermediary" not in result["changes"]["audio"]
+        books = result["changes"]["pdf"]["beginner"]["books"]
+        assert [book["id"] for book in books["added"]] == ["bg_new"]
+        assert set(result["changes"]["pdf"]) == {"beginner"}
+
+    def test_unrecorded_version_requests_full_refetch(self):
+        """Test content served without a bump is never diffed against later unrecorded edits"""
+        old_catalogs = load_catalogs()
+        audio = copy.deepcopy(old_catalogs["audio"].data)
+        audio["beginners"]["weeks"][1]["audios"][0]["title"] = "Renamed"
+        manifest = ContentManifest({**old_catalogs, "audio": Catalog("audio", audio)}, _history(old_catalogs))
+
+        assert manifest.version == 2
+        assert manifest.changes_since(2)["full"] is True
+        assert manifest.changes_since(1)["full"] is False
+
+    def test_unknown_version_requests_full_refetch(self):
+        """Test versions missing from the history fall back to a full sync"""
+        catalogs = load_catalogs()
+        manifest = ContentManifest(catalogs, _history(catalogs))
+
+        assert manifest.changes_since(None)["full"] is True
+        assert manifest.changes_since(99)["full"] is True
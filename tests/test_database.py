@@ -0,0 +1,47 @@
+"""
+Tests for the lifespan-managed Mongo client
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+from utils.database import create_client, warm_up
+
+
+class TestCreateClient:
+    """Tests for utils.database.create_client"""
+
+    def test_pool_settings_are_applied(self):
+        """Test the client is built with the configured pool and compression"""
+        client = create_client(maxPoolSize=25, minPoolSize=5, compressors="zlib")
+
+        pool_options = client.options.pool_options
+        assert pool_options.max_pool_size == 25
+        assert pool_options.min_pool_size == 5
+        assert client.options.pool_options._compression_settings.compressors == ["zlib"]
+
+    def test_warm_up_opens_connections_concurrently(self):
+        """Test warm up issues one ping per connection to pre-open"""
+        client = MagicMock()
+        client.admin.command = AsyncMock(return_value={"ok": 1})
+
+        asyncio.run(warm_up(client, connections=4))
+
+        assert client.admin.command.await_count == 4
+
+
+class TestLifespan:
+    """Tests for the app lifespan hook"""
+
+    def test_database_connected_on_startup_and_closed_on_shutdown(self, mock_database):
+        """Test collections are set on startup, before requests, and closed after"""
+        import app as app_module
+
+        with patch("app.connect_to_db", AsyncMock(return_value=mock_database)), \
+                patch("app.ensure_indexes", AsyncMock(return_value=[])) as ensure, \
+                patch("app.close_db", AsyncMock()) as close, \
+                patch("app.database", {}):
+            with TestClient(app_module.app) as client:
+                assert app_module.database is mock_database
+                assert client.get("/api/stats/test@example.com").status_code == 200
+            ensure.assert_awaited_once_with(mock_database)
+            close.assert_awaited_once_with(mock_database)
@@ -0,0 +1,85 @@
+"""
+Tests for the streaming NDJSON export
+"""
+import gzip
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+
+
+class FakeCursor:
+    """Async cursor over a fixed list of documents"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+@pytest.fixture
+def export_database():
+    """Collections whose find() returns fixed documents"""
+    users = [{"_id": ObjectId(), "phone_or_email": "a@example.com", "created_at": "2026-01-28T12:00:00"}]
+    progress = [{"_id": ObjectId(), "user_identifier": "a@example.com", "progress": {"level1": {}}, "version": 2}]
+    notes = [
+        {"_id": ObjectId(), "user_identifier": "a@example.com", "notes": {"audio_001": "Note"}},
+        {"_id": ObjectId(), "user_identifier": "b@example.com", "notes": {}}
+    ]
+    database = {}
+    for key, documents in (("users_collection", users), ("progress_collection", progress), ("notes_collection", notes)):
+        database[key] = MagicMock()
+        database[key].find.return_value = FakeCursor(documents)
+    return database
+
+
+class TestExportEndpoint:
+    """Tests for /api/admin/export"""
+
+    def test_export_requires_admin_token(self, client):
+        """Test export is refused without the admin token"""
+        with patch("utils.util.ADMIN_TOKEN", "secret"):
+            response = client.get("/api/admin/export", headers={"X-Admin-Token": "wrong"})
+
+        assert response.status_code == 401
+
+    def test_export_streams_all_collections(self, client, export_database):
+        """Test every collection is streamed as NDJSON in order, without password hashes"""
+        with patch("utils.util.ADMIN_TOKEN", "secret"), patch("app.database", export_database):
+            response = client.get("/api/admin/export", headers={"X-Admin-Token": "secret"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["collection"] for line in lines] == ["users", "progress", "notes", "notes"]
+        assert "$oid" in lines[0]["doc"]["_id"]
+        export_database["users_collection"].find.assert_called_once_with(
+            {}, {"hashed_password": 0}, sort=[("_id", 1)], batch_size=500
+        )
+
+    def test_export_resumes_gzipped(self, client, export_database):
+        """Test resuming skips earlier collections and filters on the last _id"""
+        last_id = ObjectId()
+        with patch("utils.util.ADMIN_TOKEN", "secret"), patch("app.database", export_database):
+            response = client.get(
+                f"/api/admin/export?resume_from=progress:{last_id}&compress=gzip",
+                headers={"X-Admin-Token": "secret", "Accept-Encoding": "identity"}
+            )
+
+        assert response.status_code == 200
+        lines = gzip.decompress(response.content).decode().splitlines()
+        assert [json.loads(line)["collection"] for line in lines] == ["progress", "notes", "notes"]
+        export_database["users_collection"].find.assert_not_called()
+        assert export_database["progress_collection"].find.call_args.args[0] == {"_id": {"$gt": last_id}}
+
+    def test_export_rejects_bad_resume_point(self, client):
+        """Test malformed resume points are a 400"""
+        with patch("utils.util.ADMIN_TOKEN", "secret"):
+            response = client.get("/api/admin/export?resume_from=users:nope", headers={"X-Admin-Token": "secret"})
+
+        assert response.status_code == 400
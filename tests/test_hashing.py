@@ -0,0 +1,51 @@
+"""
+Tests for the bounded bcrypt process pool
+"""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from utils.hashing import HashingPool
+from utils.util import get_password_hash, verify_password
+
+
+class TestHashingPool:
+    """Tests for utils.hashing.HashingPool"""
+
+    def test_hash_and_verify_in_worker_process(self):
+        """Test hashing and verification round trip through the pool"""
+        pool = HashingPool(workers=1, max_pending=2)
+        try:
+            hashed = asyncio.run(pool.run(get_password_hash, "Secret123!"))
+            assert asyncio.run(pool.run(verify_password, "Secret123!", hashed)) is True
+            assert asyncio.run(pool.run(verify_password, "Wrong123!", hashed)) is False
+            assert pool.pending == 0
+        finally:
+            pool.shutdown()
+
+    def test_workers_are_not_forked(self):
+        """Test workers start without a fork of the serving process"""
+        pool = HashingPool(workers=1, max_pending=1)
+        try:
+            executor = pool.start()
+            assert executor._mp_context.get_start_method() in ("forkserver", "spawn")
+        finally:
+            pool.shutdown()
+
+    def test_full_pool_rejects_with_503(self):
+        """Test jobs beyond max_pending are rejected without queueing"""
+        pool = HashingPool(workers=0, max_pending=0)
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(pool.run(get_password_hash, "Secret123!"))
+
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers["Retry-After"] == "1"
+        assert pool.pending == 0
+
+    def test_zero_workers_uses_thread_pool(self):
+        """Test the pool falls back to threads when no workers are configured"""
+        pool = HashingPool(workers=0, max_pending=1)
+
+        hashed = asyncio.run(pool.run(get_password_hash, "Secret123!"))
+
+        assert verify_password("Secret123!", hashed)
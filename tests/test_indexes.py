@@ -0,0 +1,99 @@
+"""
+Tests for startup index provisioning
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from utils.indexes import QUERY_SHAPES, ensure_indexes, explain_query_shapes
+
+
+def _collection(name, indexes):
+    collection = AsyncMock()
+    collection.name = name
+    collection.index_information.return_value = indexes
+    return collection
+
+
+@pytest.fixture
+def indexed_database():
+    """Collections that only have the default _id index"""
+    id_index = {"_id_": {"key": [("_id", 1)]}}
+    return {
+        "users_collection": _collection("Users", dict(id_index)),
+        "progress_collection": _collection("UserProgress", dict(id_index)),
+        "notes_collection": _collection("Notes", dict(id_index))
+    }
+
+
+class TestEnsureIndexes:
+    """Tests for utils.indexes.ensure_indexes"""
+
+    def test_missing_indexes_are_created(self, indexed_database):
+        """Test every required unique index is created when absent"""
+        problems = asyncio.run(ensure_indexes(indexed_database, strict=True))
+
+        assert problems == []
+        indexed_database["users_collection"].create_index.assert_awaited_once_with(
+            [("phone_or_email", 1)], name="phone_or_email_1", unique=True
+        )
+        indexed_database["notes_collection"].create_index.assert_awaited_once()
+
+    def test_existing_indexes_are_left_alone(self, indexed_database):
+        """Test startup is a no-op when the indexes already exist"""
+        indexed_database["users_collection"].index_information.return_value = {
+            "phone_or_email_1": {"key": [("phone_or_email", 1)], "unique": True}
+        }
+
+        asyncio.run(ensure_indexes(indexed_database))
+
+        indexed_database["users_collection"].create_index.assert_not_awaited()
+
+    def test_non_unique_index_is_a_mismatch(self, indexed_database):
+        """Test a non-unique index on a unique key is reported and fails strict mode"""
+        indexed_database["progress_collection"].index_information.return_value = {
+            "user_identifier_1": {"key": [("user_identifier", 1)]}
+        }
+
+        problems = asyncio.run(ensure_indexes(indexed_database, strict=False))
+        assert len(problems) == 1 and "UserProgress" in problems[0]
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(ensure_indexes(indexed_database, strict=True))
+
+    def test_users_unique_index_is_mandatory(self, indexed_database):
+        """Test a missing or non-unique users index refuses startup even when not strict"""
+        indexed_database["users_collection"].create_index.side_effect = Exception("E11000 duplicate key")
+
+        with pytest.raises(RuntimeError, match="phone_or_email_1"):
+            asyncio.run(ensure_indexes(indexed_database, strict=False))
+
+        indexed_database["users_collection"].index_information.return_value = {
+            "phone_or_email_1": {"key": [("phone_or_email", 1)]}
+        }
+        with pytest.raises(RuntimeError, match="phone_or_email_1"):
+            asyncio.run(ensure_indexes(indexed_database, strict=False))
+
+
+class TestExplainQueryShapes:
+    """Tests for utils.indexes.explain_query_shapes"""
+
+    def test_sync_version_filters_are_explained(self, indexed_database):
+        """Test the $ne version filters sync issues are among the explained shapes"""
+        async def no_stats():
+            return
+            yield
+
+        plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_identifier_1"}}
+        for collection in indexed_database.values():
+            collection.aggregate.return_value = no_stats()
+            collection.find = lambda query: SimpleNamespace(
+                explain=AsyncMock(return_value={"queryPlanner": {"winningPlan": plan}})
+            )
+
+        report = asyncio.run(explain_query_shapes(indexed_database))
+
+        explained = {(row["collection"], tuple(row["filter"])) for row in report}
+        assert ("UserProgress", ("user_identifier", "version $ne")) in explained
+        assert ("Notes", ("user_identifier", "version $ne")) in explained
+        assert len(report) == sum(len(filters) for filters in QUERY_SHAPES.values())
@@ -0,0 +1,141 @@
+"""
+Tests for request body size limits and the size-capped backup models
+"""
+import gzip
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from pydantic import ValidationError
+from utils.limits import BodySizeLimitMiddleware, MAX_BACKUP_BODY_BYTES, MAX_BODY_BYTES
+from utils.models import MAX_NOTE_LENGTH, MAX_NOTES, MAX_PROGRESS_DEPTH, NotesBackup, ProgressData
+
+
+def _chunks(body: bytes, size: int = 64 * 1024):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+class TestBodySizeLimits:
+    """Tests for per-route body limits enforced while the body streams in"""
+
+    def test_declared_length_over_limit(self, client, sample_notes):
+        """Test a Content-Length over the route limit is refused before reading"""
+        body = json.dumps({**sample_notes, "notes": {"audio_001": "x" * MAX_BACKUP_BODY_BYTES}}).encode()
+
+        response = client.post("/api/notes/backup", content=body, headers={"Content-Type": "application/json"})
+
+        assert response.status_code == 413
+
+    def test_chunked_body_over_limit(self, client, sample_notes):
+        """Test a body without Content-Length is cut off once it passes the limit"""
+        body = json.dumps({**sample_notes, "notes": {"audio_001": "x" * MAX_BACKUP_BODY_BYTES}}).encode()
+
+        response = client.post("/api/notes/backup", content=_chunks(body), headers={"Content-Type": "application/json"})
+
+        assert response.status_code == 413
+        assert response.json()["detail"] == "Request body too large"
+
+    def test_rejections_carry_cors_headers(self, client, sample_notes):
+        """Test 413s from the limit middleware are readable by browser clients"""
+        body = json.dumps({**sample_notes, "notes": {"audio_001": "x" * MAX_BACKUP_BODY_BYTES}}).encode()
+
+        response = client.post(
+            "/api/notes/backup", content=body,
+            headers={"Content-Type": "application/json", "Origin": "https://app.example.com"}
+        )
+
+        assert response.status_code == 413
+        assert "access-control-allow-origin" in response.headers
+
+    def test_gzip_body_limited_after_inflating(self, client, sample_notes):
+        """Test the limit applies to the decompressed size of gzip bodies"""
+        body = json.dumps({**sample_notes, "notes": {"audio_001": "x" * MAX_BACKUP_BODY_BYTES}}).encode()
+
+        response = client.post(
+            "/api/notes/backup",
+            content=gzip.compress(body),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+
+        assert response.status_code == 413
+        # Inflating stopped at the route's limit, below MAX_DECOMPRESSED_BODY_BYTES
+        assert response.json()["detail"] == "Decompressed request body too large"
+
+    def test_auth_routes_use_default_limit(self, client):
+        """Test small-body routes get the default limit"""
+        body = json.dumps({"phone_or_email": "a@example.com", "password": "x" * MAX_BODY_BYTES})
+
+        response = client.post("/api/auth/login", content=body, headers={"Content-Type": "application/json"})
+
+        assert response.status_code == 413
+
+    @patch('app.database')
+    def test_body_within_limit_reaches_handler(self, mock_db, client, sample_notes, mock_database):
+        """Test streamed bodies under the limit are handled normally"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+
+        response = client.post(
+            "/api/notes/backup",
+            content=_chunks(json.dumps(sample_notes).encode(), 16),
+            headers={"Content-Type": "application/json"}
+        )
+
+        assert response.status_code == 200
+
+    def test_import_is_exempt(self):
+        """Test the admin import path has no limit"""
+        middleware = BodySizeLimitMiddleware(AsyncMock())
+
+        assert middleware.limit_for("/api/admin/import") is None
+        assert middleware.limit_for("/api/notes/backup") == MAX_BACKUP_BODY_BYTES
+        assert middleware.limit_for("/api/auth/login") == MAX_BODY_BYTES
+
+
+class TestBackupModelCaps:
+    """Tests for the typed, size-capped notes and progress models"""
+
+    def test_too_many_notes(self):
+        """Test notes past MAX_NOTES are rejected"""
+        notes = {f"audio_{i}": "" for i in range(MAX_NOTES + 1)}
+
+        with pytest.raises(ValidationError):
+            NotesBackup(user_identifier="a@example.com", notes=notes)
+
+    def test_note_too_long(self):
+        """Test a note over MAX_NOTE_LENGTH is rejected"""
+        with pytest.raises(ValidationError):
+            NotesBackup(user_identifier="a@example.com", notes={"audio_001": "x" * (MAX_NOTE_LENGTH + 1)})
+
+    def test_note_must_be_text(self):
+        """Test note entries are typed as strings"""
+        with pytest.raises(ValidationError):
+            NotesBackup(user_identifier="a@example.com", notes={"audio_001": {"nested": "object"}})
+
+    @pytest.mark.parametrize("key", ["a.b", "$x", "", "a\0b", "k" * 201])
+    def test_note_key_must_be_storable(self, key):
+        """Test backup keys get the same checks as single-note audio_ids"""
+        with pytest.raises(ValidationError, match="Invalid audio_id"):
+            NotesBackup(user_identifier="a@example.com", notes={key: "text"})
+
+    def test_progress_too_deep(self, sample_progress):
+        """Test progress nested past MAX_PROGRESS_DEPTH is rejected"""
+        tree = {}
+        node = tree
+        for _ in range(MAX_PROGRESS_DEPTH + 1):
+            node["child"] = {}
+            node = node["child"]
+
+        with pytest.raises(ValidationError, match="nested deeper"):
+            ProgressData(**{**sample_progress, "progress": tree})
+
+    def test_progress_too_many_values(self, sample_progress):
+        """Test progress with too many values is rejected"""
+        with patch("utils.models.MAX_PROGRESS_NODES", 10):
+            with pytest.raises(ValidationError, match="more than 10 values"):
+                ProgressData(**{**sample_progress, "progress": {"level1": list(range(20))}})
+
+    def test_progress_within_caps(self, sample_progress):
+        """Test ordinary progress trees validate unchanged"""
+        progress = ProgressData(**sample_progress)
+
+        assert progress.progress == sample_progress["progress"]
@@ -0,0 +1,165 @@
+"""
+Tests for the Prometheus metrics and the /metrics endpoint
+"""
+import asyncio
+import gzip
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+from utils.metrics import MongoCommandMetrics
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestRequestMetrics:
+    """Tests for request latency and the /metrics endpoint"""
+
+    @patch('app.database')
+    def test_latency_recorded_by_route_template(self, mock_db, client, mock_database):
+        """Test requests are labelled with the route template and status"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        labels = {"method": "GET", "route": "/api/progress/download/{user_identifier}", "status": "404"}
+        before = _sample("http_request_duration_seconds_count", **labels)
+
+        client.get("/api/progress/download/someone@example.com")
+
+        assert _sample("http_request_duration_seconds_count", **labels) == before + 1
+
+    @patch('app.database')
+    def test_route_label_for_gzip_requests(self, mock_db, client, sample_progress, mock_database):
+        """Test the route is still found when a middleware copied the scope"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        labels = {"method": "POST", "route": "/api/progress/upload", "status": "200"}
+        before = _sample("http_request_duration_seconds_count", **labels)
+
+        client.post(
+            "/api/progress/upload",
+            content=gzip.compress(json.dumps(sample_progress).encode()),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+
+        assert _sample("http_request_duration_seconds_count", **labels) == before + 1
+
+    def test_unknown_paths_share_one_label(self, client):
+        """Test 404s for unknown paths don't create a label per path"""
+        labels = {"method": "GET", "route": "unmatched", "status": "404"}
+        before = _sample("http_request_duration_seconds_count", **labels)
+
+        client.get("/no/such/path/1")
+        client.get("/no/such/path/2")
+
+        assert _sample("http_request_duration_seconds_count", **labels) == before + 2
+
+    def test_metrics_endpoint(self, client):
+        """Test /metrics serves the Prometheus text format"""
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        for name in ("http_requests_in_flight", "threadpool_total_tokens",
+                     "bcrypt_pending", "mongo_command_duration_seconds"):
+            assert name in response.text
+
+
+class TestBcryptMetrics:
+    """Tests for bcrypt durations"""
+
+    def test_verify_duration_recorded(self):
+        """Test check_password records a verify observation"""
+        from utils.hashing import HashingPool, check_password
+        before = _sample("bcrypt_duration_seconds_count", operation="verify")
+
+        with patch("utils.hashing.hashing_pool", HashingPool(workers=0, max_pending=1)), \
+                patch("utils.hashing.verify_password", lambda plain, hashed: True):
+            assert asyncio.run(check_password("password", "hash")) is True
+
+        assert _sample("bcrypt_duration_seconds_count", operation="verify") == before + 1
+
+    def test_rejections_are_counted_not_timed(self):
+        """Test 503s from a full pool don't drag the duration histogram toward zero"""
+        from utils.hashing import HashingPool, check_password
+        durations = _sample("bcrypt_duration_seconds_count", operation="verify")
+        rejected = _sample("bcrypt_rejected_total")
+
+        with patch("utils.hashing.hashing_pool", HashingPool(workers=0, max_pending=0)):
+            with pytest.raises(HTTPException):
+                asyncio.run(check_password("password", "hash"))
+
+        assert _sample("bcrypt_duration_seconds_count", operation="verify") == durations
+        assert _sample("bcrypt_rejected_total") == rejected + 1
+
+
+class TestCacheMetrics:
+    """Tests for cache hit/miss and size metrics"""
+
+    def test_document_cache_lookups_and_bytes(self):
+        """Test document cache hits, misses and bytes are exported"""
+        from utils.cache import document_cache
+        hits = _sample("cache_lookups_total", cache="documents", result="hit")
+        misses = _sample("cache_lookups_total", cache="documents", result="miss")
+
+        async def run():
+            await document_cache.get("progress:a@example.com")
+            await document_cache.set("progress:a@example.com", {"progress": {"level1": {}}})
+            await document_cache.get("progress:a@example.com")
+        asyncio.run(run())
+
+        assert _sample("cache_lookups_total", cache="documents", result="hit") == hits + 1
+        assert _sample("cache_lookups_total", cache="documents", result="miss") == misses + 1
+        assert _sample("cache_entries", cache="documents") == 1
+        assert _sample("cache_bytes", cache="documents") == document_cache.stats()["bytes"] > 0
+
+    def test_token_cache_lookups(self):
+        """Test token cache hits and misses are exported"""
+        from utils.token_cache import token_cache
+        hits = _sample("cache_lookups_total", cache="tokens", result="hit")
+        misses = _sample("cache_lookups_total", cache="tokens", result="miss")
+
+        token_cache.get("token")
+        token_cache.put("token", {"sub": "a@example.com", "exp": time.time() + 60})
+        token_cache.get("token")
+
+        assert _sample("cache_lookups_total", cache="tokens", result="hit") == hits + 1
+        assert _sample("cache_lookups_total", cache="tokens", result="miss") == misses + 1
+        assert _sample("cache_entries", cache="tokens") == 1
+
+
+class TestMongoCommandMetrics:
+    """Tests for the pymongo command listener"""
+
+    def _events(self, command, name, duration_micros=2500):
+        started = SimpleNamespace(command=command, command_name=name, connection_id=("h", 1), request_id=7)
+        finished = SimpleNamespace(command_name=name, connection_id=("h", 1), request_id=7,
+                                   duration_micros=duration_micros)
+        return started, finished
+
+    def test_succeeded_command_by_collection(self):
+        """Test a find is recorded against its collection"""
+        listener = MongoCommandMetrics()
+        labels = {"collection": "Notes", "command": "find", "outcome": "success"}
+        before = _sample("mongo_command_duration_seconds_sum", **labels)
+        started, finished = self._events({"find": "Notes", "filter": {}}, "find")
+
+        listener.started(started)
+        listener.succeeded(finished)
+
+        assert _sample("mongo_command_duration_seconds_sum", **labels) == before + 0.0025
+        assert listener._collections == {}
+
+    def test_failed_get_more(self):
+        """Test getMore failures use the collection field"""
+        listener = MongoCommandMetrics()
+        labels = {"collection": "Users", "command": "getMore", "outcome": "failure"}
+        before = _sample("mongo_command_duration_seconds_count", **labels)
+        started, finished = self._events({"getMore": 123, "collection": "Users"}, "getMore")
+
+        listener.started(started)
+        listener.failed(finished)
+
+        assert _sample("mongo_command_duration_seconds_count", **labels) == before + 1
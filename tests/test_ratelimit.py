@@ -0,0 +1,127 @@
+"""
+Tests for the auth rate limiter
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from fastapi import HTTPException
+from utils.ratelimit import MemoryBuckets, RateLimiter, SharedBuckets, create_limiter
+
+
+class FakeSharedClient:
+    """In-memory stand-in for a Redis client"""
+
+    def __init__(self):
+        self.counters = {}
+        self.expiry = {}
+
+    async def incr(self, key):
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    async def expire(self, key, seconds):
+        self.expiry[key] = seconds
+
+
+def _request(host="10.0.0.1", forwarded_for=None):
+    headers = {"x-forwarded-for": forwarded_for} if forwarded_for else {}
+    return SimpleNamespace(client=SimpleNamespace(host=host), headers=headers)
+
+
+class TestMemoryBuckets:
+    """Tests for utils.ratelimit.MemoryBuckets"""
+
+    def test_burst_then_refill(self):
+        """Test a bucket allows its burst, then refills at its rate"""
+        now = [0.0]
+        buckets = MemoryBuckets(clock=lambda: now[0])
+
+        async def run():
+            assert await buckets.take("id:a", 2, 1.0) == 0
+            assert await buckets.take("id:a", 2, 1.0) == 0
+            assert await buckets.take("id:a", 2, 1.0) == pytest.approx(1.0)
+            now[0] = 1.0
+            assert await buckets.take("id:a", 2, 1.0) == 0
+        asyncio.run(run())
+
+    def test_least_recent_keys_dropped(self):
+        """Test the number of tracked keys stays bounded"""
+        buckets = MemoryBuckets(max_keys=2)
+
+        async def run():
+            for key in ("a", "b", "c"):
+                await buckets.take(key, 1, 1.0)
+        asyncio.run(run())
+
+        assert list(buckets._buckets) == ["b", "c"]
+
+
+class TestSharedBuckets:
+    """Tests for utils.ratelimit.SharedBuckets with a fake client"""
+
+    def test_window_counts_and_expiry(self):
+        """Test calls past the burst in one window are refused until the window ends"""
+        client = FakeSharedClient()
+        buckets = SharedBuckets(client, clock=lambda: 25.0)
+
+        async def run():
+            results = [await buckets.take("ip:a", 2, 0.1) for _ in range(3)]
+            return results
+        results = asyncio.run(run())
+
+        assert results[:2] == [0.0, 0.0]
+        assert results[2] == pytest.approx(15.0)
+        assert client.expiry == {"gsp:ratelimit:ip:a:1": 21}
+
+
+class TestRateLimiter:
+    """Tests for utils.ratelimit.RateLimiter"""
+
+    def test_identifier_limit_raises_429(self):
+        """Test the identifier bucket rejects with Retry-After"""
+        limiter = RateLimiter(MemoryBuckets(), identifier_burst=1, identifier_per_minute=1)
+
+        async def run():
+            await limiter.check(_request("10.0.0.1"), "a@example.com")
+            await limiter.check(_request("10.0.0.2"), "A@example.com ")
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(run())
+
+        assert error.value.status_code == 429
+        assert error.value.headers["Retry-After"] == "60"
+        assert limiter.rejected == 1
+
+    def test_ip_limit_across_identifiers(self):
+        """Test one client IP is limited across many identifiers"""
+        limiter = RateLimiter(MemoryBuckets(), ip_burst=2, ip_per_minute=1)
+
+        async def run():
+            for n in range(3):
+                await limiter.check(_request(), f"user{n}@example.com")
+        with pytest.raises(HTTPException):
+            asyncio.run(run())
+
+    def test_forwarded_address_behind_trusted_proxy(self):
+        """Test clients behind a trusted proxy get their own IP buckets"""
+        limiter = RateLimiter(MemoryBuckets(), trusted_proxies=["10.0.0.0/8"])
+
+        assert limiter.client_ip(_request("10.0.0.5", "203.0.113.7, 10.0.0.9")) == "203.0.113.7"
+        assert limiter.client_ip(_request("10.0.0.5")) == "10.0.0.5"
+
+    def test_forwarded_header_ignored_from_untrusted_peer(self):
+        """Test a client can't pick its bucket by sending X-Forwarded-For"""
+        limiter = RateLimiter(MemoryBuckets(), trusted_proxies=["10.0.0.0/8"])
+
+        assert limiter.client_ip(_request("198.51.100.2", "203.0.113.7")) == "198.51.100.2"
+        assert RateLimiter(MemoryBuckets()).client_ip(_request("10.0.0.5", "203.0.113.7")) == "10.0.0.5"
+
+    def test_off_backend_never_limits(self):
+        """Test the off backend lets everything through"""
+        limiter = create_limiter("off")
+
+        async def run():
+            for _ in range(100):
+                await limiter.check(_request(), "a@example.com")
+        asyncio.run(run())
+
+        assert limiter.enabled is False
@@ -0,0 +1,166 @@
+"""
+Tests for the streaming NDJSON restore
+"""
+import asyncio
+import gzip
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from pymongo.errors import BulkWriteError
+from bson.json_util import RELAXED_JSON_OPTIONS, dumps
+from benchmarks.fake_mongo import fake_database
+from utils.restore import iter_lines, restore_lines
+
+
+async def _chunks(data, size=7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _collect(lines):
+    return [line async for line in lines]
+
+
+def _record(collection, doc):
+    return json.dumps({"collection": collection, "doc": doc})
+
+
+PROGRESS = {
+    "_id": {"$oid": "65b9f1d2c3a4b5c6d7e8f901"},
+    "user_identifier": "a@example.com",
+    "progress": {"level1": {"week1": {"completed": True}}},
+    "current_level": "level1",
+    "current_week": 1,
+    "version": 4
+}
+NOTES = {"user_identifier": "a@example.com", "notes": {"audio_001": "Note"}}
+
+
+class TestIterLines:
+    """Tests for utils.restore.iter_lines"""
+
+    def test_splits_lines_across_chunks(self):
+        """Test lines split across arbitrary chunk boundaries are reassembled"""
+        data = b"first line\nsecond line\nlast"
+
+        assert asyncio.run(_collect(iter_lines(_chunks(data)))) == [b"first line", b"second line", b"last"]
+
+    def test_long_line_over_many_chunks(self):
+        """Test a line near the size cap streamed in small chunks is joined once, intact"""
+        line = b"x" * (4 * 1024 * 1024)
+        data = b"short\n" + line + b"\nend"
+
+        lines = asyncio.run(_collect(iter_lines(_chunks(data, size=64 * 1024))))
+
+        assert lines == [b"short", line, b"end"]
+
+    def test_line_over_cap_is_refused(self):
+        """Test a line past RESTORE_MAX_LINE_BYTES stops the restore"""
+        with patch("utils.restore.RESTORE_MAX_LINE_BYTES", 10):
+            with pytest.raises(ValueError, match="longer than 10 bytes"):
+                asyncio.run(_collect(iter_lines(_chunks(b"ok\n" + b"y" * 20))))
+
+    def test_gzip_is_detected(self):
+        """Test gzipped input is decompressed incrementally"""
+        data = gzip.compress(b"one\ntwo\n")
+
+        assert asyncio.run(_collect(iter_lines(_chunks(data, size=5)))) == [b"one", b"two"]
+
+    def test_every_gzip_member_is_read(self):
+        """Test a resumed export, one gzip member per run, is read to the end"""
+        data = gzip.compress(b"a\nb\n") + gzip.compress(b"c\nd\n")
+
+        assert asyncio.run(_collect(iter_lines(_chunks(data)))) == [b"a", b"b", b"c", b"d"]
+        assert asyncio.run(_collect(iter_lines(_chunks(data, size=len(data))))) == [b"a", b"b", b"c", b"d"]
+
+
+class TestRestoreLines:
+    """Tests for utils.restore.restore_lines"""
+
+    def test_valid_records_are_upserted_in_batches(self):
+        """Test records are validated and written through bulk_write batches"""
+        database = {"progress_collection": AsyncMock(), "notes_collection": AsyncMock()}
+        lines = [_record("progress", {**PROGRESS, "user_identifier": f"u{i}"}) for i in range(5)]
+        lines.append(_record("notes", NOTES))
+        data = "\n".join(lines).encode()
+
+        report = asyncio.run(restore_lines(database, iter_lines(_chunks(data)), batch_size=2))
+
+        assert database["progress_collection"].bulk_write.await_count == 3
+        requests = database["progress_collection"].bulk_write.call_args_list[0].args[0]
+        assert requests[0]._filter == {"user_identifier": "u0"}
+        assert "_id" not in requests[0]._doc and requests[0]._doc["version"] == 4
+        assert database["notes_collection"].bulk_write.call_args.args[0][0]._doc["notes_count"] == 1
+        assert report.to_dict()["written"] == 6
+
+    def test_bad_records_are_reported_without_aborting(self):
+        """Test invalid, unknown and failed records are reported by line number"""
+        database = {"progress_collection": AsyncMock(), "notes_collection": AsyncMock()}
+        database["notes_collection"].bulk_write.side_effect = BulkWriteError(
+            {"writeErrors": [{"index": 0, "errmsg": "document too large"}]}
+        )
+        data = "\n".join([
+            "not json",
+            _record("progress", {"progress": {"level1": {}}}),
+            _record("users", {"phone_or_email": "a@example.com"}),
+            _record("notes", NOTES),
+            _record("progress", PROGRESS)
+        ]).encode()
+
+        result = asyncio.run(restore_lines(database, iter_lines(_chunks(data)))).to_dict()
+
+        assert result["processed"] == 5
+        assert result["written"] == 1
+        assert result["skipped"] == 1
+        assert [error["line"] for error in result["errors"]] == [1, 2, 4]
+
+
+    def test_patch_created_documents_round_trip(self, client):
+        """Test progress upserted by a patch, and old-schema notes, restore unchanged"""
+        source = fake_database()
+        with patch("app.database", source):
+            response = client.post("/api/progress/patch", json={
+                "user_identifier": "a@example.com",
+                "operations": [{"op": "set", "path": ["level1", "week1"], "value": {"completed": True}}]
+            })
+        assert response.status_code == 200
+
+        async def run():
+            await source["notes_collection"].insert_one(
+                {"user_identifier": "a@example.com", "notes": {"audio_001": {"text": "old shape"}}}
+            )
+            lines = []
+            for name in ("progress", "notes"):
+                document = await source[f"{name}_collection"].find_one({"user_identifier": "a@example.com"})
+                lines.append(dumps({"collection": name, "doc": document}, json_options=RELAXED_JSON_OPTIONS))
+            target = fake_database()
+            report = await restore_lines(target, iter_lines(_chunks("\n".join(lines).encode())))
+            restored = await target["progress_collection"].find_one({"user_identifier": "a@example.com"}, {"_id": 0})
+            original = await source["progress_collection"].find_one({"user_identifier": "a@example.com"}, {"_id": 0})
+            return report.to_dict(), restored, original
+        report, restored, original = asyncio.run(run())
+
+        assert report["error_count"] == 0 and report["written"] == 2
+        assert "current_level" not in original
+        assert restored == original
+
+
+class TestImportEndpoint:
+    """Tests for /api/admin/import"""
+
+    def test_import_streams_body_and_reports(self, client):
+        """Test the endpoint restores a gzipped body and returns the report"""
+        database = {"progress_collection": AsyncMock(), "notes_collection": AsyncMock()}
+        body = gzip.compress((_record("progress", PROGRESS) + "\n" + _record("notes", NOTES)).encode())
+
+        with patch("utils.util.ADMIN_TOKEN", "secret"), patch("app.database", database):
+            response = client.post(
+                "/api/admin/import?batch_size=10",
+                content=body,
+                headers={"X-Admin-Token": "secret", "Content-Type": "application/x-ndjson"}
+            )
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["written"] == 2 and data["error_count"] == 0
+        assert "records_per_second" in data
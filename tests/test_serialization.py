@@ -0,0 +1,149 @@
+"""
+Tests for MessagePack content negotiation on the progress, notes and sync routes
+"""
+import json
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from utils.serialization import dumps, wants_msgpack
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+requires_msgpack = pytest.mark.skipif(msgpack is None, reason="msgpack is not installed")
+
+
+class TestAcceptNegotiation:
+    """Tests for picking the response format from the Accept header"""
+
+    def test_json_is_the_default(self):
+        """Test a missing or generic Accept header keeps JSON"""
+        assert wants_msgpack(None) is False
+        assert wants_msgpack("*/*") is False
+        assert wants_msgpack("application/json, application/msgpack") is False
+
+    def test_msgpack_preferred(self):
+        """Test msgpack is picked when it outranks JSON"""
+        assert wants_msgpack("application/msgpack") is True
+        assert wants_msgpack("application/json;q=0.5, application/x-msgpack") is True
+
+
+class TestJsonEncoding:
+    """Tests for the orjson encoder behind NegotiatedResponse"""
+
+    def test_matches_jsonable_encoder_output(self):
+        """Test raw documents encode the same as FastAPI's default path"""
+        document = {
+            "user_identifier": "test@example.com",
+            "notes": {"audio_001": "caf\u00e9 \u2713", "1": None},
+            "version": 2,
+            "updated_at": datetime(2024, 1, 1, 12, 30, 15, 250),
+        }
+
+        expected = JSONResponse(jsonable_encoder(document)).body
+        assert dumps(document) == expected
+
+    def test_falls_back_past_64_bit_integers(self):
+        """Test integers orjson refuses still encode"""
+        assert json.loads(dumps({"n": 2 ** 70})) == {"n": 2 ** 70}
+
+
+@requires_msgpack
+class TestMsgPackRequests:
+    """Tests for MessagePack request bodies"""
+
+    @patch('app.database')
+    def test_msgpack_upload_is_decoded(self, mock_db, client, sample_progress, mock_database):
+        """Test a msgpack body is validated into the same model as JSON"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+
+        response = client.post(
+            "/api/progress/upload",
+            content=msgpack.packb(sample_progress),
+            headers={"Content-Type": "application/msgpack"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        update = mock_database["progress_collection"].update_one.call_args.args[1]
+        assert update["$set"]["progress"] == sample_progress["progress"]
+
+    def test_malformed_msgpack_is_rejected(self, client):
+        """Test a body that is not valid msgpack is refused with 400"""
+        response = client.post(
+            "/api/notes/backup",
+            content=b"\xc1\xc1",
+            headers={"Content-Type": "application/msgpack"}
+        )
+
+        assert response.status_code == 400
+
+    def test_invalid_msgpack_fields_fail_validation(self, client):
+        """Test a decoded msgpack body still goes through model validation"""
+        response = client.post(
+            "/api/progress/upload",
+            content=msgpack.packb({"progress": {}}),
+            headers={"Content-Type": "application/msgpack"}
+        )
+
+        assert response.status_code == 422
+
+
+class TestMsgPackResponses:
+    """Tests for MessagePack responses"""
+
+    @requires_msgpack
+    @patch('app.database')
+    def test_download_as_msgpack(self, mock_db, client, sample_progress, mock_database):
+        """Test Accept: application/msgpack returns a packed body"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["progress_collection"].find_one.return_value = sample_progress
+
+        response = client.get(
+            f"/api/progress/download/{sample_progress['user_identifier']}",
+            headers={"Accept": "application/msgpack"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        assert "Accept" in response.headers["vary"]
+        data = msgpack.unpackb(response.content)
+        assert data["status"] is True
+        assert data["data"]["progress"] == sample_progress["progress"]
+
+    @requires_msgpack
+    @patch('app.database')
+    def test_download_msgpack_with_datetime(self, mock_db, client, sample_progress, mock_database):
+        """Test BSON datetimes in a stored document are packed as ISO strings"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["progress_collection"].find_one.return_value = {
+            **sample_progress, "updated_at": datetime(2024, 1, 1)
+        }
+
+        response = client.get(
+            f"/api/progress/download/{sample_progress['user_identifier']}",
+            headers={"Accept": "application/msgpack"}
+        )
+
+        assert msgpack.unpackb(response.content)["data"]["updated_at"] == "2024-01-01T00:00:00"
+
+    @patch('app.database')
+    def test_download_defaults_to_json(self, mock_db, client, sample_progress, mock_database):
+        """Test responses stay JSON without a msgpack Accept header"""
+        mock_db.__getitem__.side_effect = mock_database.__getitem__
+        mock_database["progress_collection"].find_one.return_value = sample_progress
+
+        response = client.get(f"/api/progress/download/{sample_progress['user_identifier']}")
+
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["status"] is True
+
+    def test_other_routes_stay_json(self, client):
+        """Test routes outside the negotiated paths ignore the Accept header"""
+        response = client.get("/", headers={"Accept": "application/msgpack"})
+
+        assert response.headers["content-type"] == "application/json"
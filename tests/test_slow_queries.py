@@ -0,0 +1,119 @@
+"""
+Tests for the slow-query profiler and /api/admin/slow-queries
+"""
+import json
+import logging
+from types import SimpleNamespace
+from unittest.mock import patch
+from utils.slow_queries import SlowQueryProfiler, query_shape
+
+
+def _run(profiler, command, duration_ms, reply=None, request_id=1):
+    name = next(iter(command))
+    ids = {"connection_id": ("h", 1), "request_id": request_id}
+    profiler.started(SimpleNamespace(command=command, command_name=name, **ids))
+    profiler.succeeded(SimpleNamespace(command_name=name, duration_micros=duration_ms * 1000,
+                                       reply=reply or {"ok": 1}, **ids))
+
+
+class TestQueryShape:
+    """Tests for filter normalization"""
+
+    def test_values_replaced_by_types(self):
+        """Test lookups for different users share one shape"""
+        first = query_shape("find", {"find": "Notes", "filter": {"user_identifier": "a@example.com"}})
+        second = query_shape("find", {"find": "Notes", "filter": {"user_identifier": "b@example.com"}})
+
+        assert first == second == '{"user_identifier":"str"}'
+
+    def test_operators_kept(self):
+        """Test operators and update filters keep their structure"""
+        shape = query_shape("update", {"update": "UserProgress", "updates": [
+            {"q": {"user_identifier": "a", "version": {"$in": [1, 2, 3]}}, "u": {}}
+        ]})
+
+        assert json.loads(shape) == {"user_identifier": "str", "version": {"$in": ["int"]}}
+
+    def test_aggregate_pipeline(self):
+        """Test aggregate shapes list stages with the $match normalized"""
+        shape = query_shape("aggregate", {"aggregate": "Notes", "pipeline": [
+            {"$match": {"user_identifier": "a"}}, {"$project": {"notes": 1}}
+        ]})
+
+        assert json.loads(shape) == [{"$match": {"user_identifier": "str"}}, {"$project": "..."}]
+
+
+class TestSlowQueryProfiler:
+    """Tests for utils.slow_queries.SlowQueryProfiler"""
+
+    def test_slow_commands_logged_as_json(self, caplog):
+        """Test commands over the threshold are logged with shape, size and duration"""
+        profiler = SlowQueryProfiler(threshold_ms=50)
+        reply = {"cursor": {"firstBatch": [{"notes": {"audio_001": "x" * 1000}}]}, "ok": 1}
+
+        with caplog.at_level(logging.WARNING, logger="gsp.slow_queries"):
+            _run(profiler, {"find": "Notes", "filter": {"user_identifier": "a"}}, 10)
+            _run(profiler, {"find": "Notes", "filter": {"user_identifier": "a"}}, 80, reply)
+
+        assert len(caplog.records) == 1
+        record = json.loads(caplog.records[0].getMessage())
+        assert record["collection"] == "Notes"
+        assert record["shape"] == '{"user_identifier":"str"}'
+        assert record["duration_ms"] == 80
+        assert record["reply_bytes"] > 1000
+
+    def test_other_collections_ignored(self):
+        """Test commands outside the profiled collections are not recorded"""
+        profiler = SlowQueryProfiler(threshold_ms=0)
+
+        _run(profiler, {"ping": 1}, 500)
+        _run(profiler, {"find": "system.views", "filter": {}}, 500)
+
+        assert profiler.top() == []
+
+    def test_top_shapes_slowest_first(self):
+        """Test shapes are aggregated and listed by their slowest command"""
+        profiler = SlowQueryProfiler(threshold_ms=0)
+
+        _run(profiler, {"find": "Users", "filter": {"phone_or_email": "a"}}, 20)
+        _run(profiler, {"find": "Users", "filter": {"phone_or_email": "b"}}, 40)
+        _run(profiler, {"find": "Notes", "filter": {"user_identifier": "a"}}, 300)
+
+        top = profiler.top(2)
+        assert [stats["collection"] for stats in top] == ["Notes", "Users"]
+        assert top[1]["count"] == 2
+        assert top[1]["mean_ms"] == 30
+        assert profiler.top(1)[0]["max_ms"] == 300
+
+    def test_shape_count_is_bounded(self):
+        """Test new shapes past max_shapes are logged but not kept"""
+        profiler = SlowQueryProfiler(threshold_ms=0, max_shapes=1)
+
+        _run(profiler, {"find": "Users", "filter": {"phone_or_email": "a"}}, 20)
+        _run(profiler, {"find": "Users", "filter": {"_id": 1}}, 20)
+
+        assert len(profiler.top()) == 1
+
+
+class TestSlowQueriesEndpoint:
+    """Tests for /api/admin/slow-queries"""
+
+    def test_lists_top_shapes(self, client):
+        """Test the endpoint returns the profiler's top shapes"""
+        profiler = SlowQueryProfiler(threshold_ms=0)
+        _run(profiler, {"find": "Notes", "filter": {"user_identifier": "a"}}, 120)
+
+        with patch("utils.util.ADMIN_TOKEN", "secret"), patch("app.slow_query_profiler", profiler):
+            response = client.get("/api/admin/slow-queries?limit=5", headers={"X-Admin-Token": "secret"})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["threshold_ms"] == 0
+        assert data["shapes"][0]["max_ms"] == 120
+
+    def test_requires_admin_token(self, client):
+        """Test the endpoint is closed without the admin token"""
+        with patch("utils.util.ADMIN_TOKEN", "secret"):
+            response = client.get("/api/admin/slow-queries")
+
+        assert response.status_code == 401
@@ -0,0 +1,47 @@
+"""
+Tests for the verified-token cache
+"""
+from unittest.mock import patch
+from utils.token_cache import TokenCache
+from utils.util import decode_token
+
+
+class TestTokenCache:
+    """Tests for utils.token_cache.TokenCache"""
+
+    def test_entry_expires_at_exp(self):
+        """Test cached claims are dropped once the token's exp passes"""
+        now = [1000.0]
+        cache = TokenCache(max_size=10, clock=lambda: now[0])
+        cache.put("token", {"sub": "test@example.com", "exp": 1010})
+
+        assert cache.get("token")["sub"] == "test@example.com"
+        now[0] = 1010.0
+        assert cache.get("token") is None
+        assert cache.stats() == {"size": 0, "hits": 1, "misses": 1}
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test the cache stays within max_size by evicting the LRU entry"""
+        cache = TokenCache(max_size=2, clock=lambda: 0)
+        cache.put("a", {"sub": "a", "exp": 10})
+        cache.put("b", {"sub": "b", "exp": 10})
+        cache.get("a")
+        cache.put("c", {"sub": "c", "exp": 10})
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+
+class TestProtectedRoutesUseCache:
+    """Tests that protected routes decode each token only once"""
+
+    def test_repeat_verify_skips_decode(self, client, auth_token):
+        """Test a second verify call is served from the token cache"""
+        headers = {"Authorization": f"Bearer {auth_token}"}
+
+        with patch("utils.util.decode_token", wraps=decode_token) as decode:
+            assert client.get("/api/auth/verify", headers=headers).status_code == 200
+            assert client.post("/api/auth/refresh", headers=headers).status_code == 200
+
+        assert decode.call_count == 1
@@ -0,0 +1,243 @@
+"""
+Read-through cache for per-user documents (profile, progress, notes).
+
+These documents only change when their owner writes, so reads are served
+from the cache and every write path invalidates the user's keys.
+
+Backends (CACHE_BACKEND):
+
+- memory: in-process LRU with a TTL and a total size cap in bytes. Each
+          worker has its own copy, so a write handled by another worker
+          is seen here only after CACHE_TTL_SECONDS.
+- redis:  shared between workers through CACHE_REDIS_URL (needs the
+          optional `redis` package). Any client with async get/set/delete
+          works, which is how tests plug in a local fake.
+- off:    no caching.
+
+A load racing a write must not store the document it read before the
+write. Every invalidate() bumps the key's generation; a loader takes the
+generation before its database read and set() drops the value when the
+generation has moved since. Generations are kept per process, so with the
+redis backend this covers writes handled by the same worker only.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+import bson
+from utils.metrics import CACHE_BYTES, CACHE_ENTRIES, CACHE_LOOKUPS
+
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 30))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_GENERATIONS = int(os.getenv("CACHE_MAX_GENERATIONS", 100000))
+
+# Returned by get() when nothing is cached; None is a valid cached value
+MISS = object()
+
+
+def _encode(value: Optional[Dict[str, Any]]) -> bytes:
+    return bson.encode({"v": value})
+
+
+def _decode(data: bytes) -> Optional[Dict[str, Any]]:
+    return bson.decode(data)["v"]
+
+
+class MemoryBackend:
+    """Thread-safe LRU of documents with per-entry expiry and a byte budget"""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            expires_at, size, value = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                return MISS
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value, ttl: float):
+        size = len(_encode(value))
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (self._clock() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    async def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class SharedBackend:
+    """Cache stored in a shared key-value server such as Redis"""
+
+    def __init__(self, client, prefix: str = "gsp:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        data = await self.client.get(self.prefix + key)
+        return MISS if data is None else _decode(data)
+
+    async def set(self, key: str, value, ttl: float):
+        await self.client.set(self.prefix + key, _encode(value), ex=max(int(ttl), 1))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def clear(self):
+        pass
+
+
+class ReadThroughCache:
+    """Read-through cache with hit/miss accounting over a pluggable backend"""
+
+    def __init__(self, backend=None, ttl: float = CACHE_TTL_SECONDS,
+                 max_generations: int = CACHE_MAX_GENERATIONS):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_generations = max_generations
+        self.hits = 0
+        self.misses = 0
+        # key -> generation of its last invalidation, oldest first. Generations
+        # come from one counter, so a key dropped past max_generations is
+        # answered with _floor, which no earlier generation of it exceeds
+        self._generations = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def get(self, key: str):
+        if self.backend is None:
+            return MISS
+        value = await self.backend.get(key)
+        if value is MISS:
+            self.misses += 1
+            CACHE_LOOKUPS.labels("documents", "miss").inc()
+        else:
+            self.hits += 1
+            CACHE_LOOKUPS.labels("documents", "hit").inc()
+        return value
+
+    def generation(self, key: str) -> int:
+        """Take before reading the database, and pass to set() with what was read"""
+        with self._lock:
+            return self._generations.get(key, self._floor)
+
+    async def set(self, key: str, value: Optional[Dict[str, Any]], generation: Optional[int] = None):
+        """Store `value`, unless `key` was invalidated since `generation` was taken"""
+        if self.backend is None:
+            return
+        if generation is not None and self.generation(key) != generation:
+            return
+        await self.backend.set(key, value, self.ttl)
+        if generation is not None and self.generation(key) != generation:
+            # Invalidated while the value was being stored
+            await self.backend.delete(key)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]):
+        """Return the cached value for `key`, calling `loader` and caching its result on a miss"""
+        generation = self.generation(key)
+        value = await self.get(key)
+        if value is MISS:
+            value = await loader()
+            await self.set(key, value, generation)
+        return value
+
+    async def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._counter += 1
+                self._generations.pop(key, None)
+                self._generations[key] = self._counter
+            while len(self._generations) > self.max_generations:
+                _, self._floor = self._generations.popitem(last=False)
+        if self.backend is not None:
+            await self.backend.delete(*keys)
+
+    async def clear(self):
+        self.hits = 0
+        self.misses = 0
+        if self.backend is not None:
+            await self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats["entries"] = len(self.backend)
+            stats["bytes"] = self.backend.size_bytes
+        return stats
+
+
+def profile_key(user_identifier: str) -> str:
+    return f"profile:{user_identifier}"
+
+
+def progress_key(user_identifier: str) -> str:
+    return f"progress:{user_identifier}"
+
+
+def notes_key(user_identifier: str) -> str:
+    return f"notes:{user_identifier}"
+
+
+def create_cache(backend: str = CACHE_BACKEND) -> ReadThroughCache:
+    if backend == "off":
+        return ReadThroughCache(None)
+    if backend == "memory":
+        return ReadThroughCache(MemoryBackend())
+    if backend == "redis":
+        import redis.asyncio
+        return ReadThroughCache(SharedBackend(redis.asyncio.from_url(CACHE_REDIS_URL)))
+    raise ValueError(f"Unknown cache backend {backend!r}")
+
+
+document_cache = create_cache()
+CACHE_ENTRIES.labels("documents").set_function(lambda: document_cache.stats().get("entries", 0))
+CACHE_BYTES.labels("documents").set_function(lambda: document_cache.stats().get("bytes", 0))
@@ -0,0 +1,185 @@
+"""
+Write-coalescing buffer for progress uploads.
+
+Backup reminders and auto-sync often make the same user upload progress
+several times within seconds. With coalescing enabled only the latest
+upload per `user_identifier` is kept for PROGRESS_COALESCE_WINDOW_MS, and
+all pending uploads are then written in one unordered `bulk_write`.
+
+Durability by mode (PROGRESS_COALESCE_MODE):
+
+- off:   every upload is its own update_one, acknowledged after the write.
+- sync:  the request waits until the bulk_write containing its upload is
+         acknowledged by Mongo, so an OK response means the data is stored,
+         exactly as with `off`. Latency grows by up to one window.
+- async: the request is acknowledged as soon as the upload is buffered.
+         Uploads still in the buffer are lost if the process crashes or the
+         flush fails (failures are logged). Pending uploads are flushed on
+         graceful shutdown.
+
+Reads, patches and resets for a user first flush or discard that user's
+pending upload, waiting out any flush already writing it, and every flush
+invalidates the cached progress of the users it wrote, so a user always
+reads their own writes. Only that user's batch is waited for: a reader
+with nothing pending or being written returns at once, whatever other
+users' batches are in flight. Batches themselves are written one at a
+time, so an older batch never lands after a newer one.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from utils.cache import document_cache, progress_key
+
+
+PROGRESS_COALESCE_MODE = os.getenv("PROGRESS_COALESCE_MODE", "off")
+PROGRESS_COALESCE_WINDOW_MS = int(os.getenv("PROGRESS_COALESCE_WINDOW_MS", 500))
+PROGRESS_COALESCE_MAX_PENDING = int(os.getenv("PROGRESS_COALESCE_MAX_PENDING", 1000))
+
+
+class ProgressWriteBuffer:
+    """Keeps the latest progress update per user and flushes them in bulk"""
+
+    def __init__(self, mode: str = PROGRESS_COALESCE_MODE,
+                 window_ms: int = PROGRESS_COALESCE_WINDOW_MS,
+                 max_pending: int = PROGRESS_COALESCE_MAX_PENDING):
+        if mode not in ("off", "sync", "async"):
+            raise ValueError(f"Unknown progress coalescing mode {mode!r}")
+        self.mode = mode
+        self.window = window_ms / 1000
+        self.max_pending = max_pending
+        self.submitted = 0
+        self.written = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        # user -> future done once the latest batch holding their upload is written
+        self._writing: Dict[str, asyncio.Future] = {}
+        self._collection = None
+        self._timer = None
+        self._tasks = set()
+        self._lock = None
+        self._lock_loop = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def has_pending(self, user_identifier: str) -> bool:
+        return user_identifier in self._pending
+
+    def _flush_lock(self) -> asyncio.Lock:
+        # Flushes run one at a time so an older batch never lands after a newer one
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def submit(self, collection, user_identifier: str, update: Dict[str, Any]):
+        """Buffer `update` as the user's latest upload; in sync mode wait for its write"""
+        loop = asyncio.get_running_loop()
+        self.submitted += 1
+        self._collection = collection
+        self._pending[user_identifier] = update
+        waiter = None
+        if self.mode == "sync":
+            waiter = loop.create_future()
+            self._waiters.setdefault(user_identifier, []).append(waiter)
+
+        if len(self._pending) >= self.max_pending:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._start_flush)
+
+        if waiter is not None:
+            await waiter
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _take(self, user_identifier: Optional[str] = None):
+        if user_identifier is None:
+            pending, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, {}
+            return pending, waiters
+        pending = {}
+        waiters = {}
+        if user_identifier in self._pending:
+            pending[user_identifier] = self._pending.pop(user_identifier)
+            waiters[user_identifier] = self._waiters.pop(user_identifier, [])
+        return pending, waiters
+
+    async def _wait_for_write(self, user_identifier: str):
+        written = self._writing.get(user_identifier)
+        if written is not None:
+            await asyncio.shield(written)
+
+    async def flush(self, user_identifier: Optional[str] = None):
+        """Write pending uploads (all, or one user's) in a single unordered bulk_write"""
+        pending, waiters = self._take(user_identifier)
+        if not pending:
+            if user_identifier is not None:
+                await self._wait_for_write(user_identifier)
+            elif self._writing:
+                await asyncio.shield(asyncio.gather(*set(self._writing.values())))
+            return
+
+        written = asyncio.get_running_loop().create_future()
+        for user in pending:
+            self._writing[user] = written
+        try:
+            # Taken before waiting on the lock, which wakes waiters in order
+            async with self._flush_lock():
+                await self._write(pending, waiters)
+        finally:
+            written.set_result(None)
+            for user in pending:
+                if self._writing.get(user) is written:
+                    del self._writing[user]
+
+    async def _write(self, pending: Dict[str, Dict[str, Any]], waiters: Dict[str, List[asyncio.Future]]):
+        users = list(pending)
+        requests = [
+            UpdateOne({"user_identifier": user}, pending[user], upsert=True)
+            for user in users
+        ]
+        errors = {}
+        try:
+            await self._collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errors[users[error["index"]]] = e
+        except Exception as e:
+            errors = {user: e for user in users}
+        # Reads during the flush may have cached the old document
+        await document_cache.invalidate(*(progress_key(user) for user in users))
+
+        self.written += len(users) - len(errors)
+        for user in users:
+            error = errors.get(user)
+            if error is not None and self.mode == "async":
+                print(f"Dropped buffered progress upload for {user}: {error}")
+            for waiter in waiters.get(user, []):
+                if waiter.done():
+                    continue
+                if error is not None:
+                    waiter.set_exception(error)
+                else:
+                    waiter.set_result(None)
+
+    async def discard(self, user_identifier: str):
+        """Drop a user's pending upload and wait out any flush already writing it"""
+        _, waiters = self._take(user_identifier)
+        for waiter in waiters.get(user_identifier, []):
+            if not waiter.done():
+                waiter.set_result(None)
+        await self._wait_for_write(user_identifier)
+
+
+progress_buffer = ProgressWriteBuffer()
@@ -0,0 +1,164 @@
+"""
+Request/response body compression for the progress and notes routes.
+
+Progress trees and notes are nested JSON that compresses very well, so on
+these routes the middleware:
+
+- decodes `Content-Encoding: gzip` request bodies, refusing with 413 once
+  the decompressed size passes the route's body limit (utils/limits.py) or
+  MAX_DECOMPRESSED_BODY_BYTES, whichever is lower (zip bombs are stopped
+  after inflating at most that many bytes);
+- compresses responses of at least COMPRESSION_MIN_SIZE bytes with brotli
+  (when the optional `brotli` package is installed) or gzip, following the
+  client's Accept-Encoding.
+"""
+import gzip
+import os
+import zlib
+from typing import Callable, Iterable, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from utils.http import BACKUP_PATHS, pick_encoding
+from utils.limits import body_limit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+MAX_DECOMPRESSED_BODY_BYTES = int(os.getenv("MAX_DECOMPRESSED_BODY_BYTES", 8 * 1024 * 1024))
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """ASGI middleware decoding gzip requests and compressing responses on selected paths"""
+
+    def __init__(self, app, paths: Iterable[str] = BACKUP_PATHS,
+                 minimum_size: int = COMPRESSION_MIN_SIZE,
+                 max_decompressed_size: int = MAX_DECOMPRESSED_BODY_BYTES,
+                 limit_for: Callable[[str], Optional[int]] = body_limit):
+        self.app = app
+        self.paths = tuple(paths)
+        self.minimum_size = minimum_size
+        self.max_decompressed_size = max_decompressed_size
+        self.limit_for = limit_for
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "").strip().lower()
+        if content_encoding == "gzip":
+            max_size = self.max_decompressed_size
+            route_limit = self.limit_for(scope["path"])
+            if route_limit is not None:
+                max_size = min(max_size, route_limit)
+            try:
+                body = await self._inflate(receive, max_size)
+            except BodyTooLarge:
+                await self._reject(scope, receive, send, 413, "Decompressed request body too large")
+                return
+            except zlib.error:
+                await self._reject(scope, receive, send, 400, "Invalid gzip request body")
+                return
+            scope = dict(scope)
+            request_headers = MutableHeaders(scope=scope)
+            del request_headers["content-encoding"]
+            request_headers["content-length"] = str(len(body))
+            receive = self._replay(body)
+        elif content_encoding not in ("", "identity"):
+            await self._reject(scope, receive, send, 415, f"Unsupported Content-Encoding {content_encoding!r}")
+            return
+
+        encoding = pick_encoding(headers.get("accept-encoding"), self.encodings)
+        await self.app(scope, receive, self._compressing_send(send, encoding))
+
+    @staticmethod
+    async def _inflate(receive, max_size: int) -> bytes:
+        decompressor = zlib.decompressobj(31)
+        parts = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            more_body = message.get("more_body", False)
+            data = message.get("body", b"")
+            while data:
+                # Inflate at most one byte past the cap at a time
+                inflated = decompressor.decompress(data, max_size - size + 1)
+                size += len(inflated)
+                if size > max_size:
+                    raise BodyTooLarge()
+                parts.append(inflated)
+                data = decompressor.unconsumed_tail
+        tail = decompressor.flush()
+        if size + len(tail) > max_size:
+            raise BodyTooLarge()
+        parts.append(tail)
+        if not decompressor.eof:
+            raise zlib.error("truncated gzip stream")
+        return b"".join(parts)
+
+    @staticmethod
+    def _replay(body: bytes):
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return receive
+
+    @staticmethod
+    async def _reject(scope, receive, send, status_code: int, detail: str):
+        response = JSONResponse({"detail": detail}, status_code=status_code)
+        await response(scope, receive, send)
+
+    def _compressing_send(self, send, encoding: Optional[str]):
+        start_message = None
+        passthrough = False
+
+        async def wrapped(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if message.get("more_body", False) or encoding is None or "content-encoding" in headers \
+                    or len(body) < self.minimum_size:
+                # Streams, already encoded or small bodies go out as they are
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+        return wrapped
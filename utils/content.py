@@ -0,0 +1,251 @@
+"""
+Content catalog served to the app on every open.
+
+The catalog JSON files are loaded and validated once, then kept in memory
+as compact JSON together with a strong ETag and gzip/brotli encodings, so
+serving them costs no serialization or compression per request.
+
+Every content drop is also recorded in a versioned manifest
+(content_manifest.json) holding a hash per level and per week/book. Clients
+send the version they last synced and get back only what changed since.
+
+    python -m utils.content bump     # record the current files as a new version
+    python -m utils.content status   # show the current and recorded versions
+"""
+import gzip
+import hashlib
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from utils.http import etag_matches, pick_encoding
+from utils.models import AudioLevel, BookLevel
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+CONTENT_DIR = Path(__file__).resolve().parent.parent
+
+CATALOG_FILES = {
+    "audio": ("content_upload_audio.json", TypeAdapter(Dict[str, AudioLevel])),
+    "pdf": ("content_upload_pdf.json", TypeAdapter(Dict[str, BookLevel])),
+}
+
+MANIFEST_FILE = CONTENT_DIR / "content_manifest.json"
+
+# Per catalog: the list holding a level's items and how each item is keyed
+CATALOG_ITEMS = {
+    "audio": ("weeks", lambda week: str(week["weekNumber"])),
+    "pdf": ("books", lambda book: book["id"]),
+}
+
+
+class Catalog:
+    """A validated catalog file with its precomputed representations"""
+
+    def __init__(self, name: str, data: dict):
+        self.name = name
+        self.data = data
+        self.body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.version = None
+        self.encoded = {"gzip": gzip.compress(self.body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(self.body, quality=11)
+
+    def response(self, request: Request) -> Response:
+        """Build a 304 or a (possibly compressed) 200 response for `request`"""
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding"
+        }
+        if self.version is not None:
+            headers["X-Content-Version"] = str(self.version)
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        encoding = pick_encoding(request.headers.get("accept-encoding"), ("br", "gzip"))
+        body = self.body
+        if encoding in self.encoded:
+            body = self.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def load_catalog(name: str, directory: Path = CONTENT_DIR) -> Catalog:
+    """Read and validate one catalog file; raises on invalid content"""
+    filename, adapter = CATALOG_FILES[name]
+    with open(directory / filename, "rb") as f:
+        data = json.load(f)
+    adapter.validate_python(data)
+    return Catalog(name, data)
+
+
+def load_catalogs(directory: Path = CONTENT_DIR) -> Dict[str, Catalog]:
+    return {name: load_catalog(name, directory) for name in CATALOG_FILES}
+
+
+def _digest(value: Any) -> str:
+    body = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+
+def _level_meta(level: dict, items_key: str) -> dict:
+    return {k: v for k, v in level.items() if k != items_key}
+
+
+def build_manifest(catalogs: Dict[str, Catalog]) -> Dict[str, Any]:
+    """Hash every level (its own fields and item order) and every week/book"""
+    manifest = {}
+    for name, catalog in catalogs.items():
+        items_key, item_id = CATALOG_ITEMS[name]
+        levels = {}
+        for level_name, level in catalog.data.items():
+            items = level[items_key]
+            levels[level_name] = {
+                "meta": _digest(_level_meta(level, items_key)),
+                "order": _digest([item_id(item) for item in items]),
+                items_key: {item_id(item): _digest(item) for item in items}
+            }
+        manifest[name] = levels
+    return manifest
+
+
+def diff_manifest(old: Dict[str, Any], new: Dict[str, Any], catalogs: Dict[str, Catalog]) -> Dict[str, Any]:
+    """
+    Describe how `catalogs` (hashed as `new`) differ from an older manifest.
+
+    Unchanged levels are left out. Added levels are returned whole; for
+    modified levels only the added/modified weeks or books are returned,
+    plus the removed ids and the current item order.
+    """
+    changes = {}
+    for name, catalog in catalogs.items():
+        items_key, item_id = CATALOG_ITEMS[name]
+        old_levels = old.get(name, {})
+        levels = {}
+        for level_name, level in catalog.data.items():
+            before = old_levels.get(level_name)
+            after = new[name][level_name]
+            if before is None:
+                levels[level_name] = {"status": "added", "level": level}
+                continue
+            if before == after:
+                continue
+
+            items = {item_id(item): item for item in level[items_key]}
+            change = {"status": "modified"}
+            if before["meta"] != after["meta"]:
+                change["meta"] = _level_meta(level, items_key)
+            change[items_key] = {
+                "added": [items[i] for i in after[items_key] if i not in before[items_key]],
+                "modified": [
+                    items[i] for i in after[items_key]
+                    if i in before[items_key] and before[items_key][i] != after[items_key][i]
+                ],
+                "removed": [i for i in before[items_key] if i not in after[items_key]]
+            }
+            change["order"] = list(items)
+            levels[level_name] = change
+
+        for level_name in old_levels:
+            if level_name not in catalog.data:
+                levels[level_name] = {"status": "removed"}
+        if levels:
+            changes[name] = levels
+    return changes
+
+
+def read_manifest_history(path: Path = MANIFEST_FILE) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["versions"]
+
+
+def write_manifest_history(versions: List[Dict[str, Any]], path: Path = MANIFEST_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"versions": versions}, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+class ContentManifest:
+    """Current catalog version plus the recorded manifests of older versions"""
+
+    def __init__(self, catalogs: Dict[str, Catalog], history: List[Dict[str, Any]]):
+        self.catalogs = catalogs
+        self.current = build_manifest(catalogs)
+        self.history = {entry["version"]: entry["manifest"] for entry in history}
+
+        latest = history[-1] if history else None
+        if latest and latest["digest"] == _digest(self.current):
+            self.version = latest["version"]
+        else:
+            # Files changed without a bump; serve them as the next version.
+            # It is left out of the history: edits made before the next bump
+            # reuse this number, so it can't be diffed from and a client
+            # syncing from it refetches in full (unchanged catalogs are a 304)
+            self.version = (latest["version"] if latest else 0) + 1
+            print(
+                f"Content files do not match manifest version {latest['version'] if latest else None}, "
+                f"serving them as version {self.version}. Run `python -m utils.content bump`."
+            )
+
+        for catalog in catalogs.values():
+            catalog.version = self.version
+        self._changes = {}
+
+    def changes_since(self, since: Optional[int]) -> Dict[str, Any]:
+        """
+        Changes between version `since` and the current version. Unknown
+        or unrecorded versions get `full: True`, telling the client to
+        refetch the catalogs.
+        """
+        old = self.history.get(since) if since is not None else None
+        if old is None:
+            return {"version": self.version, "since": since, "full": True, "changes": {}}
+        if since not in self._changes:
+            self._changes[since] = diff_manifest(old, self.current, self.catalogs)
+        return {"version": self.version, "since": since, "full": False, "changes": self._changes[since]}
+
+
+def load_manifest(catalogs: Dict[str, Catalog], path: Path = MANIFEST_FILE) -> ContentManifest:
+    return ContentManifest(catalogs, read_manifest_history(path))
+
+
+def bump_manifest(directory: Path = CONTENT_DIR, path: Path = MANIFEST_FILE) -> int:
+    """Record the current content files as a new manifest version if they changed"""
+    catalogs = load_catalogs(directory)
+    history = read_manifest_history(path)
+    manifest = build_manifest(catalogs)
+    digest = _digest(manifest)
+    if history and history[-1]["digest"] == digest:
+        return history[-1]["version"]
+
+    version = (history[-1]["version"] if history else 0) + 1
+    history.append({
+        "version": version,
+        "digest": digest,
+        "created_at": datetime.now().isoformat(),
+        "manifest": manifest
+    })
+    write_manifest_history(history, path)
+    return version
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "bump":
+        print(f"Content manifest is at version {bump_manifest()}")
+    elif command == "status":
+        manifest = load_manifest(load_catalogs())
+        print(f"Serving version {manifest.version}, recorded versions: {sorted(manifest.history)}")
+    else:
+        sys.exit(f"Unknown command {command!r}, expected bump or status")
@@ -0,0 +1,130 @@
+"""
+Streaming NDJSON export of users, progress and notes.
+
+Each line is one document as MongoDB relaxed extended JSON:
+
+    {"collection": "users", "doc": {"_id": {"$oid": "..."}, "phone_or_email": "..."}}
+
+Collections are read in `_id` order through batched cursors and yielded in
+chunks, so memory stays flat however many users there are. Users are
+exported without `hashed_password`. Every document is read as of its
+batch, not as one point-in-time snapshot; an interrupted export can be
+continued with `resume_from=<collection>:<last exported _id>`.
+
+    python -m utils.export backup.ndjson.gz
+    python -m utils.export backup.ndjson.gz --resume-from notes:65b9...  # appends
+"""
+import argparse
+import asyncio
+import os
+import sys
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+from bson import ObjectId
+from bson.json_util import RELAXED_JSON_OPTIONS, dumps
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# Export name -> (collections dict key, projection)
+EXPORT_COLLECTIONS = {
+    "users": ("users_collection", {"hashed_password": 0}),
+    "progress": ("progress_collection", None),
+    "notes": ("notes_collection", None),
+}
+
+
+def parse_resume_from(value: Optional[str]) -> Optional[Tuple[str, ObjectId]]:
+    """Parse `<collection>:<ObjectId>`; raises ValueError when malformed"""
+    if not value:
+        return None
+    name, _, object_id = value.partition(":")
+    if name not in EXPORT_COLLECTIONS or not ObjectId.is_valid(object_id):
+        raise ValueError(f"Invalid resume point {value!r}, expected <collection>:<ObjectId>")
+    return name, ObjectId(object_id)
+
+
+def parse_collections(value: Optional[str]) -> Tuple[str, ...]:
+    if not value:
+        return tuple(EXPORT_COLLECTIONS)
+    names = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = [name for name in names if name not in EXPORT_COLLECTIONS]
+    if unknown or not names:
+        raise ValueError(f"Unknown collections {unknown}, expected some of {list(EXPORT_COLLECTIONS)}")
+    return names
+
+
+async def export_lines(database: Dict[str, Any],
+                       collections: Iterable[str] = tuple(EXPORT_COLLECTIONS),
+                       resume_from: Optional[Tuple[str, ObjectId]] = None,
+                       batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Yield NDJSON in chunks of roughly EXPORT_CHUNK_BYTES"""
+    collections = list(collections)
+    if resume_from is not None:
+        # Collections before the resume point were already exported
+        collections = collections[collections.index(resume_from[0]):]
+
+    chunk = []
+    size = 0
+    for name in collections:
+        key, projection = EXPORT_COLLECTIONS[name]
+        query = {}
+        if resume_from is not None and resume_from[0] == name:
+            query = {"_id": {"$gt": resume_from[1]}}
+        cursor = database[key].find(query, projection, sort=[("_id", 1)], batch_size=batch_size)
+        async for document in cursor:
+            line = dumps({"collection": name, "doc": document}, json_options=RELAXED_JSON_OPTIONS)
+            line = line.encode("utf-8") + b"\n"
+            chunk.append(line)
+            size += len(line)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield b"".join(chunk)
+                chunk = []
+                size = 0
+    if chunk:
+        yield b"".join(chunk)
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Gzip an async byte stream incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def _main(argv):
+    parser = argparse.ArgumentParser(prog="python -m utils.export", description="Export users, progress and notes as NDJSON")
+    parser.add_argument("out", help="output file, gzipped when it ends with .gz")
+    parser.add_argument("--collections", help="comma separated subset of users,progress,notes")
+    parser.add_argument("--resume-from", help="<collection>:<_id> of the last exported document; output is appended")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    try:
+        collections = parse_collections(args.collections)
+        resume_from = parse_resume_from(args.resume_from)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from utils.database import connect_to_db, close_db
+    database = await connect_to_db()
+    try:
+        chunks = export_lines(database, collections, resume_from, args.batch_size)
+        if args.out.endswith(".gz"):
+            chunks = gzip_chunks(chunks)
+        written = 0
+        with open(args.out, "ab" if resume_from else "wb") as f:
+            async for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        print(f"Wrote {written} bytes to {args.out}")
+    finally:
+        await close_db(database)
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
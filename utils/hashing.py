@@ -0,0 +1,123 @@
+"""
+Bounded process pool for bcrypt hashing and verification.
+
+bcrypt is deliberately CPU heavy, so it runs in worker processes across
+all cores instead of the request thread. The number of in-flight jobs is
+capped; once the cap is reached new jobs are rejected immediately with a
+503 rather than queueing behind a login spike.
+
+Workers are started with forkserver (spawn where it is unavailable)
+rather than fork, which would copy the running event loop, the Mongo
+client's sockets and its monitor threads into each worker.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from fastapi import HTTPException, status
+from utils.metrics import BCRYPT_DURATION, BCRYPT_PENDING, BCRYPT_REJECTED
+from utils.util import get_password_hash, verify_password
+
+
+# Pool settings, 0 workers runs bcrypt on the event loop's default thread pool
+BCRYPT_POOL_WORKERS = int(os.getenv("BCRYPT_POOL_WORKERS", os.cpu_count() or 1))
+BCRYPT_POOL_MAX_PENDING = int(os.getenv("BCRYPT_POOL_MAX_PENDING", max(BCRYPT_POOL_WORKERS, 1) * 8))
+BCRYPT_RETRY_AFTER_SECONDS = 1
+BCRYPT_POOL_START_METHOD = os.getenv(
+    "BCRYPT_POOL_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class HashingPool:
+    """Process pool with a bounded number of queued and running jobs"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self):
+        """Create the worker processes up front"""
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(BCRYPT_POOL_START_METHOD)
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                BCRYPT_REJECTED.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please try again shortly",
+                    headers={"Retry-After": str(BCRYPT_RETRY_AFTER_SECONDS)}
+                )
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func, *args, operation: Optional[str] = None):
+        """
+        Run `func(*args)` in the pool, rejecting with 503 when it is full.
+        Admitted jobs are timed into bcrypt_duration_seconds{operation}.
+        """
+        self._acquire()
+        timer = BCRYPT_DURATION.labels(operation).time() if operation else nullcontext()
+        try:
+            with timer:
+                return await self._run(func, *args)
+        finally:
+            self._release()
+
+    async def _run(self, func, *args):
+        try:
+            executor = self._executor or self.start()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool as e:
+            # A worker died, drop the pool so the next call starts a fresh one
+            print(e)
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": str(BCRYPT_RETRY_AFTER_SECONDS)}
+            )
+
+
+hashing_pool = HashingPool(BCRYPT_POOL_WORKERS, BCRYPT_POOL_MAX_PENDING)
+BCRYPT_PENDING.set_function(lambda: hashing_pool.pending)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password in the bcrypt pool"""
+    return await hashing_pool.run(get_password_hash, password, operation="hash")
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash in the bcrypt pool"""
+    return await hashing_pool.run(verify_password, plain_password, hashed_password, operation="verify")
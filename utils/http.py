@@ -0,0 +1,84 @@
+"""
+Small HTTP helpers for conditional requests and content negotiation
+"""
+import hashlib
+from typing import Any, Dict, Iterable, Optional
+
+
+# Fields a stored backup document's ETag is derived from
+VERSION_FIELDS = {"_id": 0, "version": 1, "updated_at": 1}
+
+# Progress, notes and sync routes, whose bodies are compressed and may be MessagePack
+BACKUP_PATHS = (
+    "/api/progress/upload",
+    "/api/progress/patch",
+    "/api/progress/download/",
+    "/api/notes/backup",
+    "/api/notes/batch",
+    "/api/notes/retrieve/",
+    "/api/sync",
+)
+
+
+def document_etag(document: Dict[str, Any]) -> Optional[str]:
+    """
+    Weak ETag for a stored backup document from its version and updated_at.
+    updated_at keeps the tag unique when a document is deleted and
+    recreated with the version counter starting over.
+    """
+    version = document.get("version")
+    updated_at = document.get("updated_at")
+    if version is None and updated_at is None:
+        return None
+    stamp = hashlib.sha1(f"{version}:{updated_at}".encode("utf-8")).hexdigest()[:20]
+    return f'W/"{stamp}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def parse_qualities(header: Optional[str]) -> Dict[str, float]:
+    """Lowercased values of an Accept or Accept-Encoding header -> their q-value"""
+    accepted = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = max(quality, accepted.get(name, 0.0))
+    return accepted
+
+
+def pick_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """
+    Pick the first encoding from `available` (in server preference order)
+    that the client accepts, or None for identity.
+    """
+    if not accept_encoding:
+        return None
+    accepted = parse_qualities(accept_encoding)
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
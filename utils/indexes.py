@@ -0,0 +1,173 @@
+"""
+Index provisioning for the app's collections.
+
+Every query in app.py filters on `phone_or_email` (Users) or
+`user_identifier` (UserProgress, Notes). The indexes backing those
+filters are declared here, created at startup when missing, and checked
+for mismatching options.
+
+    python -m utils.indexes ensure    # create missing indexes, report mismatches
+    python -m utils.indexes explain   # show the plan and index usage per query shape
+"""
+import asyncio
+import os
+import sys
+from typing import Any, Dict, List
+from pymongo import ASCENDING
+
+
+# Refuse startup (instead of only logging) when an index is missing or wrong
+INDEXES_STRICT = os.getenv("MONGO_INDEXES_STRICT", "0") == "1"
+
+# "mandatory" indexes refuse startup whatever INDEXES_STRICT says: register
+# relies on phone_or_email_1 alone to reject duplicate accounts
+REQUIRED_INDEXES = {
+    "users_collection": [
+        {"keys": [("phone_or_email", ASCENDING)], "name": "phone_or_email_1", "unique": True, "mandatory": True},
+    ],
+    "progress_collection": [
+        {"keys": [("user_identifier", ASCENDING)], "name": "user_identifier_1", "unique": True},
+    ],
+    "notes_collection": [
+        {"keys": [("user_identifier", ASCENDING)], "name": "user_identifier_1", "unique": True},
+    ],
+}
+
+# One representative filter per query shape issued by app.py
+QUERY_SHAPES = {
+    "users_collection": [
+        {"phone_or_email": "user@example.com"},
+    ],
+    "progress_collection": [
+        {"user_identifier": "user@example.com"},
+        {"user_identifier": "user@example.com", "version": 1},
+        # /api/sync download when the client already has a version
+        {"user_identifier": "user@example.com", "version": {"$ne": 1}},
+    ],
+    "notes_collection": [
+        {"user_identifier": "user@example.com"},
+        {"user_identifier": "user@example.com", "version": {"$ne": 1}},
+    ],
+}
+
+
+def _key(keys) -> List[tuple]:
+    return [(field, direction) for field, direction in keys]
+
+
+async def ensure_indexes(database: Dict[str, Any], strict: bool = INDEXES_STRICT) -> List[str]:
+    """
+    Create missing required indexes and return a list of problems found.
+    With `strict`, any problem raises RuntimeError so startup is aborted;
+    problems with a mandatory index always raise.
+    """
+    problems = []
+    fatal = []
+    for collection_name, specs in REQUIRED_INDEXES.items():
+        collection = database[collection_name]
+        existing = await collection.index_information()
+        for spec in specs:
+            match = next(
+                (info for info in existing.values() if _key(info["key"]) == _key(spec["keys"])),
+                None
+            )
+            problem = None
+            if match is None:
+                try:
+                    await collection.create_index(spec["keys"], name=spec["name"], unique=spec["unique"])
+                    print(f"Created index {spec['name']} on {collection.name}")
+                except Exception as e:
+                    problem = f"{collection.name}.{spec['name']}: could not be created ({e})"
+            elif bool(match.get("unique", False)) != spec["unique"]:
+                problem = (
+                    f"{collection.name}.{spec['name']}: expected unique={spec['unique']}, "
+                    f"found unique={bool(match.get('unique', False))}"
+                )
+            if problem:
+                problems.append(problem)
+                if spec.get("mandatory"):
+                    fatal.append(problem)
+
+    for problem in problems:
+        print(f"Index problem: {problem}")
+    if fatal or (problems and strict):
+        raise RuntimeError(f"Index verification failed: {'; '.join(problems)}")
+    return problems
+
+
+def _winning_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    return plan.get("queryPlan", plan)
+
+
+def _filter_fields(query: Dict[str, Any]) -> List[str]:
+    """Filtered fields, with the operator for operator conditions"""
+    return sorted(
+        f"{field} {' '.join(condition)}" if isinstance(condition, dict) else field
+        for field, condition in query.items()
+    )
+
+
+def _plan_summary(plan: Dict[str, Any]) -> Dict[str, Any]:
+    stages = []
+    index_name = None
+    while plan:
+        stages.append(plan.get("stage"))
+        index_name = index_name or plan.get("indexName")
+        plan = plan.get("inputStage")
+    return {"stages": stages, "index": index_name}
+
+
+async def explain_query_shapes(database: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Explain each query shape and attach the $indexStats usage of its index"""
+    report = []
+    for collection_name, filters in QUERY_SHAPES.items():
+        collection = database[collection_name]
+        usage = {}
+        async for stats in await collection.aggregate([{"$indexStats": {}}]):
+            usage[stats["name"]] = stats["accesses"]["ops"]
+        for query in filters:
+            explain = await collection.find(query).explain()
+            summary = _plan_summary(_winning_plan(explain))
+            execution = explain.get("executionStats", {})
+            report.append({
+                "collection": collection.name,
+                "filter": _filter_fields(query),
+                "stages": summary["stages"],
+                "index": summary["index"],
+                "keys_examined": execution.get("totalKeysExamined"),
+                "docs_examined": execution.get("totalDocsExamined"),
+                "index_ops": usage.get(summary["index"])
+            })
+    return report
+
+
+async def _main(command: str):
+    from utils.database import connect_to_db, close_db
+    database = await connect_to_db()
+    try:
+        if command == "ensure":
+            try:
+                problems = await ensure_indexes(database, strict=False)
+            except RuntimeError as e:
+                print(e)
+                return 1
+            print("All indexes present" if not problems else f"{len(problems)} index problem(s)")
+            return 1 if problems else 0
+        for row in await explain_query_shapes(database):
+            scan = "COLLSCAN" in row["stages"]
+            print(
+                f"{'!!' if scan else 'ok'} {row['collection']} {{{', '.join(row['filter'])}}}: "
+                f"{' <- '.join(row['stages'])}, index={row['index']}, "
+                f"keys={row['keys_examined']}, docs={row['docs_examined']}, index_ops={row['index_ops']}"
+            )
+        return 0
+    finally:
+        await close_db(database)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "explain"
+    if command not in ("ensure", "explain"):
+        sys.exit(f"Unknown command {command!r}, expected ensure or explain")
+    sys.exit(asyncio.run(_main(command)))
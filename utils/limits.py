@@ -0,0 +1,97 @@
+"""
+Request body size limits, enforced while the body streams in.
+
+A declared Content-Length over the route's limit is refused with 413
+before any of the body is read. Chunked bodies are counted as they arrive
+and the read is aborted with 413 as soon as they pass the limit, so a
+worker never buffers more than the limit (plus one chunk) for a request.
+
+Gzip bodies are inflated by CompressionMiddleware first, so the limit
+applies to the decompressed size; that middleware also stops inflating
+once a body passes its route's limit.
+"""
+import os
+from typing import Dict, Iterable, Optional
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", 64 * 1024))
+MAX_BACKUP_BODY_BYTES = int(os.getenv("MAX_BACKUP_BODY_BYTES", 4 * 1024 * 1024))
+BODY_LIMITS = {
+    "/api/progress/upload": MAX_BACKUP_BODY_BYTES,
+    "/api/progress/patch": MAX_BACKUP_BODY_BYTES,
+    "/api/notes/backup": MAX_BACKUP_BODY_BYTES,
+    "/api/notes/batch": MAX_BACKUP_BODY_BYTES,
+    "/api/sync": MAX_BACKUP_BODY_BYTES,
+}
+# Streamed by the handler itself, no limit applies
+BODY_LIMIT_EXEMPT_PATHS = ("/api/admin/import",)
+
+
+def body_limit(path: str, limits: Dict[str, int] = BODY_LIMITS,
+               default_limit: int = MAX_BODY_BYTES,
+               exempt_paths: Iterable[str] = BODY_LIMIT_EXEMPT_PATHS) -> Optional[int]:
+    """Byte limit for a request body on this path, None when exempt"""
+    if path.startswith(tuple(exempt_paths)):
+        return None
+    for prefix, limit in limits.items():
+        if path.startswith(prefix):
+            return limit
+    return default_limit
+
+
+class BodySizeLimitMiddleware:
+    """ASGI middleware refusing request bodies over a per-route byte limit"""
+
+    def __init__(self, app, limits: Dict[str, int] = BODY_LIMITS,
+                 default_limit: int = MAX_BODY_BYTES,
+                 exempt_paths: Iterable[str] = BODY_LIMIT_EXEMPT_PATHS):
+        self.app = app
+        self.limits = dict(limits)
+        self.default_limit = default_limit
+        self.exempt_paths = tuple(exempt_paths)
+
+    def limit_for(self, path: str) -> Optional[int]:
+        return body_limit(path, self.limits, self.default_limit, self.exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limit_for(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None:
+            try:
+                declared = int(content_length)
+            except ValueError:
+                declared = 0
+            if declared > limit:
+                response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, self._limited_receive(receive, limit), send)
+
+    @staticmethod
+    def _limited_receive(receive, limit: int):
+        received = 0
+
+        async def limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Surfaces through FastAPI's body reading as a 413 response
+                    raise HTTPException(
+                        status_code=413,
+                        detail="Request body too large"
+                    )
+            return message
+        return limited
@@ -0,0 +1,144 @@
+"""
+Prometheus metrics, served from /metrics.
+
+- http_request_duration_seconds{method,route,status}: time from the request
+  reaching the app until its last body byte is sent, so handler, JSON
+  encoding and compression are all included. `route` is the route's path
+  template, "unmatched" for 404s, to keep label cardinality bounded.
+- http_requests_in_flight
+- threadpool_*: anyio's default thread limiter, which runs sync
+  dependencies and file IO; borrowed == total means calls are queueing.
+- bcrypt_duration_seconds{operation}, bcrypt_pending and bcrypt_rejected_total
+  (utils/hashing.py); durations only cover jobs the pool admitted
+- mongo_command_duration_seconds{collection,command,outcome}: from pymongo
+  command monitoring, i.e. the round trip to Atlas as the driver sees it.
+- cache_lookups_total{cache,result}, cache_entries{cache} and
+  cache_bytes{cache}: the document cache (utils/cache.py, cache="documents";
+  entries and bytes only with the memory backend) and the JWT claims cache
+  (utils/token_cache.py, cache="tokens").
+
+Metrics are per process; with several workers each one is scraped (or
+prometheus_client's multiprocess mode is configured) separately.
+"""
+import time
+from typing import Dict, Tuple
+import anyio.to_thread
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from starlette.routing import Match
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and status",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled")
+THREADPOOL_BORROWED = Gauge("threadpool_borrowed_tokens", "Threadpool workers in use")
+THREADPOOL_TOTAL = Gauge("threadpool_total_tokens", "Threadpool size")
+THREADPOOL_WAITING = Gauge("threadpool_waiting_tasks", "Calls waiting for a threadpool worker")
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds", "bcrypt hash/verify time including pool queueing, admitted jobs only",
+    ["operation"], buckets=LATENCY_BUCKETS
+)
+BCRYPT_PENDING = Gauge("bcrypt_pending", "bcrypt jobs queued or running")
+BCRYPT_REJECTED = Counter("bcrypt_rejected", "bcrypt jobs refused with 503 because the pool was full")
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency by collection and command",
+    ["collection", "command", "outcome"], buckets=LATENCY_BUCKETS
+)
+CACHE_LOOKUPS = Counter("cache_lookups", "Cache lookups by cache and hit/miss", ["cache", "result"])
+CACHE_ENTRIES = Gauge("cache_entries", "Entries held by an in-process cache", ["cache"])
+CACHE_BYTES = Gauge("cache_bytes", "Bytes held by an in-process cache", ["cache"])
+
+
+def route_label(scope) -> str:
+    """Path template of the route handling this request"""
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        # Middleware that copied the scope won't see the router's update
+        for candidate in scope["app"].router.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def recording_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_LATENCY.labels(scope["method"], route_label(scope), str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener feeding mongo_command_duration_seconds"""
+
+    def __init__(self):
+        # (connection_id, request_id) -> collection of commands in flight
+        self._collections: Dict[Tuple, str] = {}
+
+    @staticmethod
+    def collection_of(command) -> str:
+        name = next(iter(command), None)
+        target = command.get(name) if name else None
+        if name == "getMore":
+            target = command.get("collection")
+        return target if isinstance(target, str) else "-"
+
+    def started(self, event):
+        self._collections[(event.connection_id, event.request_id)] = self.collection_of(event.command)
+
+    def succeeded(self, event):
+        self._observe(event, "success")
+
+    def failed(self, event):
+        self._observe(event, "failure")
+
+    def _observe(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name, outcome).observe(
+            event.duration_micros / 1e6
+        )
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+def update_threadpool_gauges():
+    """Sample anyio's default thread limiter, must run on the event loop"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    THREADPOOL_BORROWED.set(limiter.borrowed_tokens)
+    THREADPOOL_TOTAL.set(limiter.total_tokens)
+    THREADPOOL_WAITING.set(limiter.statistics().tasks_waiting)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with their content type"""
+    update_threadpool_gauges()
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,8 +1,52 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Dict, Any, Optional
+import os
+from pydantic import AfterValidator, BaseModel, ConfigDict, EmailStr, Field, StringConstraints, field_validator, model_validator
+from typing import Annotated, Dict, Any, List, Literal, Optional
 from datetime import datetime
 
 
+# Caps keeping validation of a single backup bounded in CPU and memory
+MAX_NOTES = int(os.getenv("MAX_NOTES", 5000))
+MAX_NOTE_LENGTH = int(os.getenv("MAX_NOTE_LENGTH", 20000))
+MAX_KEY_LENGTH = 200
+MAX_PROGRESS_NODES = int(os.getenv("MAX_PROGRESS_NODES", 50000))
+MAX_PROGRESS_DEPTH = 8
+
+NoteText = Annotated[str, StringConstraints(max_length=MAX_NOTE_LENGTH)]
+
+
+def check_progress_tree(tree: Any) -> Any:
+    """
+    Check a progress (sub)tree holds only JSON values, stays within
+    MAX_PROGRESS_DEPTH levels and MAX_PROGRESS_NODES values, and has
+    bounded keys and strings. Stops at the first node over a cap.
+    """
+    nodes = 0
+    stack = [(tree, 0)]
+    while stack:
+        node, depth = stack.pop()
+        nodes += 1
+        if nodes > MAX_PROGRESS_NODES:
+            raise ValueError(f"Progress has more than {MAX_PROGRESS_NODES} values")
+        if isinstance(node, dict):
+            if depth >= MAX_PROGRESS_DEPTH:
+                raise ValueError(f"Progress is nested deeper than {MAX_PROGRESS_DEPTH} levels")
+            for key, value in node.items():
+                if not isinstance(key, str) or len(key) > MAX_KEY_LENGTH:
+                    raise ValueError("Progress keys must be strings of at most "
+                                     f"{MAX_KEY_LENGTH} characters")
+                stack.append((value, depth + 1))
+        elif isinstance(node, list):
+            if depth >= MAX_PROGRESS_DEPTH:
+                raise ValueError(f"Progress is nested deeper than {MAX_PROGRESS_DEPTH} levels")
+            stack.extend((value, depth + 1) for value in node)
+        elif isinstance(node, str):
+            if len(node) > MAX_NOTE_LENGTH:
+                raise ValueError(f"Progress strings are limited to {MAX_NOTE_LENGTH} characters")
+        elif node is not None and not isinstance(node, (bool, int, float)):
+            raise ValueError(f"Unsupported progress value of type {type(node).__name__}")
+    return tree
+
+
 class UserRegister(BaseModel):
     phone_or_email: str
     password: str
@@ -19,18 +63,111 @@ class ProgressData(BaseModel):
     current_audio: Optional[str] = None
     updated_at: str = Field(default_factory=lambda: datetime.now().isoformat())
 
+    @field_validator("progress")
+    @classmethod
+    def check_progress(cls, progress: Dict[str, Any]) -> Dict[str, Any]:
+        return check_progress_tree(progress)
+
+class ProgressOperation(BaseModel):
+    op: Literal["set", "unset"]
+    path: List[str] = Field(min_length=1, max_length=MAX_PROGRESS_DEPTH)  # keys below `progress`, e.g. [level, week, audio]
+    value: Any = None
+
+    @field_validator("path")
+    @classmethod
+    def check_path(cls, path: List[str]) -> List[str]:
+        for key in path:
+            if not key or "." in key or key.startswith("$") or "\0" in key or len(key) > MAX_KEY_LENGTH:
+                raise ValueError(f"Invalid progress key {key!r}")
+        return path
+
+    @field_validator("value")
+    @classmethod
+    def check_value(cls, value: Any) -> Any:
+        return check_progress_tree(value)
+
+class ProgressPatch(BaseModel):
+    user_identifier: str  # phone or email
+    operations: List[ProgressOperation] = Field(min_length=1, max_length=1000)
+    base_version: Optional[int] = None  # reject the patch if the server moved on
+    current_level: Optional[str] = None
+    current_week: Optional[int] = None
+    current_audio: Optional[str] = None
+    updated_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+    @model_validator(mode="after")
+    def check_conflicts(self):
+        # Mongo refuses updates where one path is a prefix of another
+        paths = sorted(tuple(operation.path) for operation in self.operations)
+        for previous, path in zip(paths, paths[1:]):
+            if path[:len(previous)] == previous:
+                raise ValueError(f"Conflicting progress paths {'.'.join(previous)} and {'.'.join(path)}")
+        return self
+
+def check_note_key(audio_id: str) -> str:
+    if not audio_id or "." in audio_id or audio_id.startswith("$") or "\0" in audio_id \
+            or len(audio_id) > MAX_KEY_LENGTH:
+        raise ValueError(f"Invalid audio_id {audio_id!r}")
+    return audio_id
+
+NoteKey = Annotated[str, AfterValidator(check_note_key)]
+
 class NoteData(BaseModel):
     user_identifier: str
     audio_id: str
-    note_text: str
+    note_text: NoteText
+    updated_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+
+    @field_validator("audio_id")
+    @classmethod
+    def check_audio_id(cls, audio_id: str) -> str:
+        return check_note_key(audio_id)
+
+class NotesBatch(BaseModel):
+    user_identifier: str
+    upserts: List[NoteData] = Field(default_factory=list, max_length=1000)
+    deletes: List[str] = Field(default_factory=list, max_length=1000)  # audio_ids
     updated_at: str = Field(default_factory=lambda: datetime.now().isoformat())
 
+    @field_validator("deletes")
+    @classmethod
+    def check_deletes(cls, deletes: List[str]) -> List[str]:
+        return [check_note_key(audio_id) for audio_id in deletes]
+
+    @model_validator(mode="after")
+    def check_batch(self):
+        if not self.upserts and not self.deletes:
+            raise ValueError("Batch must contain at least one upsert or delete")
+        upserted = set()
+        for note in self.upserts:
+            if note.user_identifier != self.user_identifier:
+                raise ValueError("Every note must belong to the batch's user_identifier")
+            upserted.add(note.audio_id)
+        if upserted.intersection(self.deletes):
+            raise ValueError("An audio_id cannot be both upserted and deleted")
+        return self
+
 class NotesBackup(BaseModel):
     user_identifier: str
-    notes: Dict[str, Any]  # All notes
+    notes: Dict[NoteKey, NoteText] = Field(max_length=MAX_NOTES)  # All notes, audio_id -> text
     updated_at: str = Field(default_factory=lambda: datetime.now().isoformat())
 
 
+class SyncRequest(BaseModel):
+    user_identifier: str
+    progress: Optional[ProgressData] = None  # upload when given
+    notes: Optional[NotesBackup] = None  # upload when given
+    progress_version: Optional[int] = None  # last version the client has
+    notes_version: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_owner(self):
+        for payload in (self.progress, self.notes):
+            if payload is not None and payload.user_identifier != self.user_identifier:
+                raise ValueError("Sync payloads must belong to the request's user_identifier")
+        return self
+
+
 class UserProfile(BaseModel):
     user_identifier: str
     name: Optional[str] = None
@@ -50,3 +187,53 @@ class PasswordReset(BaseModel):
 class DeleteAccount(BaseModel):
     user_identifier: str
     password: str
+
+
+"""
+Stored document models, accepting every shape the app has written
+(used by restore; patch upserts have no current_level, older notes
+may hold non-string values)
+"""
+
+class StoredProgress(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    user_identifier: str
+    progress: Dict[str, Any] = {}
+
+class StoredNotes(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    user_identifier: str
+    notes: Dict[str, Any] = {}
+
+
+"""
+Content catalog models (content_upload_audio.json / content_upload_pdf.json)
+"""
+
+class CatalogAudio(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    id: str
+    title: str
+
+class CatalogWeek(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    weekNumber: int
+    title: str
+    audios: List[CatalogAudio]
+
+class AudioLevel(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    title: str
+    description: str
+    weeks: List[CatalogWeek]
+
+class CatalogBook(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    id: str
+    title: str
+
+class BookLevel(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    title: str
+    description: str
+    books: List[CatalogBook]
@@ -0,0 +1,175 @@
+"""
+Rate limiting for the auth routes, which each spend a bcrypt operation.
+
+Every call takes a token from two buckets, one keyed on the account's
+phone_or_email and one on the client IP; an empty bucket answers 429 with
+Retry-After before any password is hashed or checked.
+
+Behind a load balancer the peer address is the proxy's, which would put
+every client in one IP bucket. Either run uvicorn with --proxy-headers
+--forwarded-allow-ips=<proxy addresses>, or list the proxies (addresses
+or CIDR ranges) in RATE_LIMIT_TRUSTED_PROXIES; requests from them are
+keyed on the last X-Forwarded-For address that is not itself a trusted
+proxy.
+
+Backends (RATE_LIMIT_BACKEND):
+
+- memory: in-process token buckets, per worker. Buckets refill
+          continuously at `rate` tokens per second up to `burst`.
+- redis:  shared between workers through RATE_LIMIT_REDIS_URL (needs the
+          optional `redis` package). Counts calls in fixed windows of
+          burst / rate seconds with INCR/EXPIRE, which allows the same
+          average rate but up to two bursts around a window edge.
+- off:    no limiting.
+"""
+import ipaddress
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+from fastapi import HTTPException, Request, status
+
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_IDENTIFIER_BURST = int(os.getenv("RATE_LIMIT_IDENTIFIER_BURST", 10))
+RATE_LIMIT_IDENTIFIER_PER_MINUTE = float(os.getenv("RATE_LIMIT_IDENTIFIER_PER_MINUTE", 5))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", 30))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", 30))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+RATE_LIMIT_TRUSTED_PROXIES = [
+    proxy.strip() for proxy in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if proxy.strip()
+]
+
+
+class MemoryBuckets:
+    """Thread-safe token buckets, least recently used ones dropped past max_keys"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        """Take a token, returning 0 when allowed or the seconds until one is available"""
+        now = self._clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SharedBuckets:
+    """Fixed-window counters stored in a shared key-value server such as Redis"""
+
+    def __init__(self, client, prefix: str = "gsp:ratelimit:", clock=time.time):
+        self.client = client
+        self.prefix = prefix
+        self._clock = clock
+
+    async def take(self, key: str, burst: int, rate: float) -> float:
+        window = burst / rate
+        now = self._clock()
+        index = int(now // window)
+        counter = f"{self.prefix}{key}:{index}"
+        count = await self.client.incr(counter)
+        if count == 1:
+            await self.client.expire(counter, math.ceil(window) + 1)
+        if count <= burst:
+            return 0.0
+        return (index + 1) * window - now
+
+    def clear(self):
+        pass
+
+
+class RateLimiter:
+    """Per-identifier and per-IP limits over a pluggable bucket backend"""
+
+    def __init__(self, backend=None,
+                 identifier_burst: int = RATE_LIMIT_IDENTIFIER_BURST,
+                 identifier_per_minute: float = RATE_LIMIT_IDENTIFIER_PER_MINUTE,
+                 ip_burst: int = RATE_LIMIT_IP_BURST,
+                 ip_per_minute: float = RATE_LIMIT_IP_PER_MINUTE,
+                 trusted_proxies: Iterable[str] = RATE_LIMIT_TRUSTED_PROXIES):
+        self.backend = backend
+        self.limits = {
+            "id": (identifier_burst, identifier_per_minute / 60),
+            "ip": (ip_burst, ip_per_minute / 60),
+        }
+        self.trusted_proxies = tuple(ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies)
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _trusted(self, host: str) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    def client_ip(self, request: Request) -> str:
+        """Peer address, or the forwarded client address when the peer is a trusted proxy"""
+        host = request.client.host if request.client else "unknown"
+        if not self._trusted(host):
+            return host
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        for address in reversed(forwarded):
+            if not self._trusted(address):
+                return address
+        return forwarded[0] if forwarded else host
+
+    async def check(self, request: Request, identifier: Optional[str]):
+        """Raise 429 with Retry-After when either bucket for this call is empty"""
+        if self.backend is None:
+            return
+        keys = [("ip", self.client_ip(request))]
+        if identifier:
+            keys.insert(0, ("id", identifier.strip().lower()))
+        for kind, value in keys:
+            burst, rate = self.limits[kind]
+            retry_after = await self.backend.take(f"{kind}:{value}", burst, rate)
+            if retry_after > 0:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many attempts, try again later",
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+
+    def clear(self):
+        self.rejected = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+
+def create_limiter(backend: str = RATE_LIMIT_BACKEND) -> RateLimiter:
+    if backend == "off":
+        return RateLimiter(None)
+    if backend == "memory":
+        return RateLimiter(MemoryBuckets())
+    if backend == "redis":
+        import redis.asyncio
+        return RateLimiter(SharedBuckets(redis.asyncio.from_url(RATE_LIMIT_REDIS_URL)))
+    raise ValueError(f"Unknown rate limit backend {backend!r}")
+
+
+auth_limiter = create_limiter()
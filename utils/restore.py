@@ -0,0 +1,213 @@
+"""
+Streaming restore of an NDJSON export (see utils/export.py).
+
+The input is read incrementally (gzip is detected from its magic bytes),
+each record is validated against StoredProgress / StoredNotes (every
+document shape the app writes, not just full uploads), and valid
+records are upserted by `user_identifier` through unordered `bulk_write`
+batches. Invalid records are reported with their line number and never
+abort the run. `users` records are skipped: exports carry no password
+hashes, so accounts cannot be restored from them.
+
+    python -m utils.restore backup.ndjson.gz --batch-size 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, List
+from bson.json_util import loads
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+from utils.models import StoredNotes, StoredProgress
+
+
+RESTORE_BATCH_SIZE = int(os.getenv("RESTORE_BATCH_SIZE", 500))
+RESTORE_MAX_LINE_BYTES = 16 * 1024 * 1024  # Mongo's document limit
+RESTORE_MAX_REPORTED_ERRORS = 100
+
+# Export name -> (collections dict key, model validating the document)
+RESTORE_COLLECTIONS = {
+    "progress": ("progress_collection", StoredProgress),
+    "notes": ("notes_collection", StoredNotes),
+}
+
+
+class RestoreReport:
+    """Counters and per-record errors for one restore run"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.processed = 0
+        self.written = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < RESTORE_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "processed": self.processed,
+            "written": self.written,
+            "skipped": self.skipped,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "records_per_second": round(self.processed / elapsed, 1) if elapsed else None
+        }
+
+
+def _inflate(decompressor, data: bytes):
+    """
+    Inflate `data`, starting a new decompressor at each gzip member
+    boundary; resumed exports append one member per run.
+    """
+    inflated = []
+    while data:
+        if decompressor.eof:
+            decompressor = zlib.decompressobj(47)
+        inflated.append(decompressor.decompress(data))
+        data = decompressor.unused_data
+    return decompressor, b"".join(inflated)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a (possibly gzipped) byte stream into lines without buffering it whole"""
+    decompressor = None
+    # Pieces of the line still waiting for its newline, joined once it arrives
+    partial = []
+    partial_size = 0
+    first = True
+    async for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk[:2] == b"\x1f\x8b":
+                decompressor = zlib.decompressobj(47)
+        if decompressor is not None:
+            try:
+                decompressor, chunk = _inflate(decompressor, chunk)
+            except zlib.error as e:
+                raise ValueError(f"Invalid gzip stream: {e}")
+        end = chunk.rfind(b"\n")
+        if end == -1:
+            tail = chunk
+        else:
+            partial.append(chunk[:end])
+            for line in b"".join(partial).split(b"\n"):
+                yield line
+            tail = chunk[end + 1:]
+            partial = []
+            partial_size = 0
+        if tail:
+            partial.append(tail)
+            partial_size += len(tail)
+        if partial_size > RESTORE_MAX_LINE_BYTES:
+            raise ValueError(f"Line longer than {RESTORE_MAX_LINE_BYTES} bytes")
+    if decompressor is not None:
+        partial.append(decompressor.flush())
+    buffer = b"".join(partial)
+    if buffer:
+        yield buffer
+
+
+def _replacement(name: str, document: Dict[str, Any]) -> ReplaceOne:
+    """Validate an exported document and build its upsert"""
+    model = RESTORE_COLLECTIONS[name][1]
+    validated = model.model_validate(document)
+    # Stored as exported, only defaults for fields an old document lacks are added
+    replacement = validated.model_dump()
+    replacement.pop("_id", None)
+    if name == "notes":
+        replacement["notes_count"] = len(validated.notes)
+    return ReplaceOne({"user_identifier": validated.user_identifier}, replacement, upsert=True)
+
+
+async def restore_lines(database: Dict[str, Any], lines: AsyncIterator[bytes],
+                        batch_size: int = RESTORE_BATCH_SIZE) -> RestoreReport:
+    """Validate and upsert every record, flushing per collection every `batch_size`"""
+    report = RestoreReport()
+    pending = {name: [] for name in RESTORE_COLLECTIONS}
+
+    async def flush(name: str):
+        batch, pending[name] = pending[name], []
+        if not batch:
+            return
+        requests = [request for _, request in batch]
+        try:
+            await database[RESTORE_COLLECTIONS[name][0]].bulk_write(requests, ordered=False)
+            report.written += len(batch)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            report.written += len(batch) - len(write_errors)
+            for error in write_errors:
+                report.error(batch[error["index"]][0], error.get("errmsg", "write error"))
+        except Exception as e:
+            for line_number, _ in batch:
+                report.error(line_number, f"batch write failed: {e}")
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        report.processed += 1
+        try:
+            record = loads(line)
+            name = record["collection"]
+            if name == "users":
+                report.skipped += 1
+                continue
+            if name not in RESTORE_COLLECTIONS:
+                raise ValueError(f"Unknown collection {name!r}")
+            request = _replacement(name, record["doc"])
+        except Exception as e:
+            report.error(line_number, str(e))
+            continue
+
+        pending[name].append((line_number, request))
+        if len(pending[name]) >= batch_size:
+            await flush(name)
+
+    for name in RESTORE_COLLECTIONS:
+        await flush(name)
+    return report
+
+
+async def _file_chunks(path: str, size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+async def _main(argv):
+    parser = argparse.ArgumentParser(prog="python -m utils.restore", description="Restore progress and notes from an NDJSON export")
+    parser.add_argument("path", help="NDJSON export, optionally gzipped")
+    parser.add_argument("--batch-size", type=int, default=RESTORE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from utils.database import connect_to_db, close_db
+    database = await connect_to_db()
+    try:
+        report = await restore_lines(database, iter_lines(_file_chunks(args.path)), args.batch_size)
+    finally:
+        await close_db(database)
+
+    result = report.to_dict()
+    for error in result["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    print(
+        f"Processed {result['processed']} records: {result['written']} written, {result['skipped']} skipped, "
+        f"{result['error_count']} errors in {result['elapsed_seconds']}s ({result['records_per_second']}/s)"
+    )
+    return 1 if result["error_count"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
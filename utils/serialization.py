@@ -0,0 +1,141 @@
+"""
+MessagePack content negotiation for the progress, notes and sync routes.
+
+JSON stays the default. On utils.http.BACKUP_PATHS a client may instead:
+
+- send a body with `Content-Type: application/msgpack`, which is unpacked
+  and validated into the same pydantic models as a JSON body;
+- send `Accept: application/msgpack` to get the response packed with
+  MessagePack instead of JSON.
+
+MessagePack needs the optional `msgpack` package; without it msgpack
+bodies are refused with 415 and responses are always JSON.
+
+JSON is encoded with orjson. Handlers on hot read paths build a
+NegotiatedResponse themselves from the BSON-decoded document, which skips
+FastAPI's jsonable_encoder pass over the whole tree.
+"""
+import json
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import Any, Callable, Optional
+import orjson
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from utils.http import BACKUP_PATHS, parse_qualities
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+# Accept values that a JSON response satisfies
+JSON_TYPES = ("application/json", "application/*", "*/*")
+
+# Media type the current request's response should be rendered as
+_response_format: ContextVar[str] = ContextVar("response_format", default="application/json")
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    return content_type.split(";", 1)[0].strip().lower() in MSGPACK_TYPES
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """
+    True when the Accept header prefers MessagePack over JSON.
+    Ties go to JSON, as does a missing header or a missing msgpack package.
+    """
+    if not accept or msgpack is None:
+        return False
+    accepted = parse_qualities(accept)
+    best_msgpack = max(accepted.get(media, 0.0) for media in MSGPACK_TYPES)
+    best_json = max(accepted.get(media, 0.0) for media in JSON_TYPES)
+    return best_msgpack > best_json
+
+
+def encode_default(value: Any) -> Any:
+    """Fallback for values the encoders don't handle natively (BSON types)"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON, same output as Starlette's JSONResponse"""
+    try:
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # orjson refuses integers past 64 bits, the stdlib does not
+        return json.dumps(
+            content, default=encode_default, ensure_ascii=False,
+            allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def packb(content: Any) -> bytes:
+    return msgpack.packb(content, default=encode_default, use_bin_type=True)
+
+
+def unpackb(body: bytes) -> Any:
+    return msgpack.unpackb(body, raw=False)
+
+
+class MsgPackRequest(Request):
+    """Request whose body is MessagePack but is handed to FastAPI as parsed JSON"""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = unpackb(await self.body())
+        return self._json
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSON response that renders as MessagePack when the client asked for it"""
+
+    def render(self, content: Any) -> bytes:
+        if _response_format.get() == MSGPACK_MEDIA_TYPE:
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return packb(content)
+        return dumps(content)
+
+
+class NegotiatedRoute(APIRoute):
+    """Route decoding MessagePack bodies and picking the response format on BACKUP_PATHS"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        if not self.path.startswith(BACKUP_PATHS):
+            return handler
+
+        async def negotiated_handler(request: Request) -> Response:
+            if is_msgpack(request.headers.get("content-type")):
+                if msgpack is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="MessagePack bodies are not supported"
+                    )
+                # FastAPI only parses bodies it sees as JSON
+                request.scope["headers"] = [
+                    (name, b"application/json" if name == b"content-type" else value)
+                    for name, value in request.scope["headers"]
+                ]
+                request = MsgPackRequest(request.scope, request.receive, request._send)
+
+            response_format = MSGPACK_MEDIA_TYPE if wants_msgpack(request.headers.get("accept")) else "application/json"
+            token = _response_format.set(response_format)
+            try:
+                response = await handler(request)
+            finally:
+                _response_format.reset(token)
+            response.headers.append("Vary", "Accept")
+            return response
+
+        return negotiated_handler
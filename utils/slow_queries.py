@@ -0,0 +1,158 @@
+"""
+Slow-query log and query-shape profiler for the app's collections.
+
+A pymongo command listener (registered in utils.database.create_client)
+times every command against Users, Notes and UserProgress. Commands at or
+over SLOW_QUERY_MS are:
+
+- logged as one JSON object per line on the "gsp.slow_queries" logger,
+  with the command, collection, normalized filter shape, reply size and
+  duration;
+- folded into per-shape totals, listed slowest first by
+  /api/admin/slow-queries.
+
+A shape replaces every value in the filter with its type name, so all
+`{"user_identifier": <str>}` lookups are one shape whatever the user.
+Reply sizes are only measured for slow commands.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import bson
+from pymongo import monitoring
+
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+SLOW_QUERY_MAX_SHAPES = int(os.getenv("SLOW_QUERY_MAX_SHAPES", 1000))
+PROFILED_COLLECTIONS = ("Users", "Notes", "UserProgress")
+
+logger = logging.getLogger("gsp.slow_queries")
+
+
+def normalize(value: Any) -> Any:
+    """Replace the values in a filter with their type names, keeping keys and operators"""
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in/$or lists of any length have the same shape
+        return [normalize(value[0])] if value else []
+    return type(value).__name__
+
+
+def command_filter(command_name: str, command: Dict[str, Any]) -> Any:
+    """The part of a command that decides which documents it touches"""
+    if command_name in ("find", "count", "delete", "update"):
+        if command_name == "find":
+            return command.get("filter", {})
+        if command_name == "count":
+            return command.get("query", {})
+        statements = command.get("deletes" if command_name == "delete" else "updates") or [{}]
+        return statements[0].get("q", {})
+    if command_name == "findAndModify":
+        return command.get("query", {})
+    if command_name == "aggregate":
+        return [
+            {stage: normalize(spec) if stage == "$match" else "..."}
+            for stage_doc in command.get("pipeline", []) for stage, spec in stage_doc.items()
+        ]
+    return {}
+
+
+def query_shape(command_name: str, command: Dict[str, Any]) -> str:
+    shape = command_filter(command_name, command)
+    if command_name != "aggregate":
+        shape = normalize(shape)
+    return json.dumps(shape, sort_keys=True, separators=(",", ":"))
+
+
+class SlowQueryProfiler(monitoring.CommandListener):
+    """Command listener logging and aggregating commands over a duration threshold"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS,
+                 collections=PROFILED_COLLECTIONS, max_shapes: int = SLOW_QUERY_MAX_SHAPES):
+        self.threshold_ms = threshold_ms
+        self.collections = frozenset(collections)
+        self.max_shapes = max_shapes
+        self.started_at = time.time()
+        # (connection_id, request_id) -> (collection, command_name, shape) of commands in flight
+        self._in_flight: Dict[Tuple, Tuple[str, str, str]] = {}
+        self._shapes: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        name = event.command_name
+        collection = event.command.get(name)
+        if name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str) or collection not in self.collections:
+            return
+        self._in_flight[(event.connection_id, event.request_id)] = (
+            collection, name, query_shape(name, event.command)
+        )
+
+    def succeeded(self, event):
+        self._finish(event, getattr(event, "reply", None), None)
+
+    def failed(self, event):
+        self._finish(event, None, getattr(event, "failure", None))
+
+    def _finish(self, event, reply: Optional[Dict[str, Any]], failure):
+        command = self._in_flight.pop((event.connection_id, event.request_id), None)
+        if command is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+        collection, name, shape = command
+        reply_bytes = len(bson.encode(reply)) if reply else 0
+        record = {
+            "event": "slow_query",
+            "collection": collection,
+            "command": name,
+            "shape": shape,
+            "duration_ms": round(duration_ms, 3),
+            "reply_bytes": reply_bytes,
+        }
+        if failure is not None:
+            record["failure"] = str(failure)
+        logger.warning(json.dumps(record))
+        self._record(collection, name, shape, duration_ms, reply_bytes)
+
+    def _record(self, collection: str, name: str, shape: str, duration_ms: float, reply_bytes: int):
+        key = (collection, name, shape)
+        with self._lock:
+            stats = self._shapes.get(key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    return
+                stats = self._shapes[key] = {
+                    "collection": collection, "command": name, "shape": shape,
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "max_reply_bytes": 0,
+                }
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["max_reply_bytes"] = max(stats["max_reply_bytes"], reply_bytes)
+            stats["last_seen"] = time.time()
+
+    def top(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Recorded shapes, slowest single command first"""
+        with self._lock:
+            shapes = [dict(stats) for stats in self._shapes.values()]
+        shapes.sort(key=lambda stats: stats["max_ms"], reverse=True)
+        for stats in shapes[:limit]:
+            stats["mean_ms"] = round(stats["total_ms"] / stats["count"], 3)
+            stats["total_ms"] = round(stats["total_ms"], 3)
+            stats["max_ms"] = round(stats["max_ms"], 3)
+        return shapes[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._shapes.clear()
+        self._in_flight.clear()
+
+
+slow_query_profiler = SlowQueryProfiler()
@@ -0,0 +1,75 @@
+"""
+LRU + TTL cache of verified JWT claims.
+
+Entries are keyed on the raw token and expire at the token's own `exp`
+claim, so a cached token is never accepted after jose would reject it.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import os
+from utils.metrics import CACHE_ENTRIES, CACHE_LOOKUPS
+
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+
+class TokenCache:
+    """Thread-safe LRU cache of decoded token claims"""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, clock=time.time):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Return cached claims for `token`, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("tokens", "miss").inc()
+                return None
+            expires_at, claims = entry
+            if expires_at <= self._clock():
+                del self._entries[token]
+                self.misses += 1
+                CACHE_LOOKUPS.labels("tokens", "miss").inc()
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            CACHE_LOOKUPS.labels("tokens", "hit").inc()
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]):
+        """Cache claims until their `exp`; tokens without one are not cached"""
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (expires_at, claims)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+token_cache = TokenCache()
+CACHE_ENTRIES.labels("tokens").set_function(lambda: token_cache.stats()["size"])
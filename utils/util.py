@@ -1,8 +1,10 @@
 from passlib.context import CryptContext
+import hmac
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import os
 from fastapi import HTTPException, status, Header
+from utils.token_cache import token_cache
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -12,6 +14,9 @@ SECRET_KEY = os.getenv("SECRET_KEY", "t7t7PWOxi='D0ov9iG&L+.I{K!x~8g0zr^M3v_P;g(
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24 * 365  # 100 days
 
+# Admin APIs are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # Helper functions
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -53,10 +58,27 @@ def get_current_user(authorization: str = Header(None)):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid authentication scheme"
             )
-        payload = decode_token(token)
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = decode_token(token)
+            token_cache.put(token, payload)
         return payload.get("sub")
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authorization header format"
         )
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    """Dependency guarding admin APIs with the X-Admin-Token header"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled"
+        )
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )